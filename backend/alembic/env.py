@@ -14,6 +14,7 @@ from apps.models.agent_action import AgentAction
 from apps.models.email_verification import EmailVerification
 from apps.models.context_file import ContextFile
 from apps.models.subscription import Subscription, UsageLimits
+from apps.models.processed_payment import ProcessedPayment
 
 # this is the Alembic Config object
 config = context.config
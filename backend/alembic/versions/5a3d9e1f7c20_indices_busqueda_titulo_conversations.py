@@ -0,0 +1,43 @@
+"""Indices de busqueda por titulo en conversations
+
+Revision ID: 5a3d9e1f7c20
+Revises: e8b2f0c6a914
+Create Date: 2026-10-16 11:48:05.913270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a3d9e1f7c20'
+down_revision: Union[str, Sequence[str], None] = 'e8b2f0c6a914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # CONCURRENTLY no puede ejecutarse dentro de una transacción
+    with op.get_context().autocommit_block():
+        # Substring (LIKE '%q%') sobre lower(title)
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_conversations_title_trgm
+            ON conversations USING GIN (lower(title) gin_trgm_ops)
+        """)
+        # Búsqueda por palabras (plainto_tsquery)
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_conversations_title_tsv
+            ON conversations USING GIN (to_tsvector('spanish', coalesce(title, '')))
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_conversations_title_tsv")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_conversations_title_trgm")
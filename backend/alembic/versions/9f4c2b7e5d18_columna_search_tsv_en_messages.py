@@ -0,0 +1,54 @@
+"""Columna search_tsv en messages para busqueda por contenido
+
+Revision ID: 9f4c2b7e5d18
+Revises: 5a3d9e1f7c20
+Create Date: 2026-10-16 12:21:39.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f4c2b7e5d18'
+down_revision: Union[str, Sequence[str], None] = '5a3d9e1f7c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 1️⃣ Columna tsvector
+    op.add_column('messages', sa.Column('search_tsv', postgresql.TSVECTOR(), nullable=True))
+
+    # 2️⃣ Trigger que la mantiene en cada INSERT/UPDATE
+    op.execute("""
+        CREATE TRIGGER messages_search_tsv_update
+        BEFORE INSERT OR UPDATE OF content ON messages
+        FOR EACH ROW EXECUTE FUNCTION
+        tsvector_update_trigger(search_tsv, 'pg_catalog.spanish', content)
+    """)
+
+    # 3️⃣ Poblar mensajes existentes
+    op.execute("""
+        UPDATE messages
+        SET search_tsv = to_tsvector('pg_catalog.spanish', coalesce(content, ''))
+    """)
+
+    # 4️⃣ Índice GIN (CONCURRENTLY no puede ir dentro de una transacción)
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_search_tsv
+            ON messages USING GIN (search_tsv)
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_messages_search_tsv")
+    op.execute("DROP TRIGGER IF EXISTS messages_search_tsv_update ON messages")
+    op.drop_column('messages', 'search_tsv')
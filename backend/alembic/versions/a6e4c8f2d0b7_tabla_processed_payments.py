@@ -0,0 +1,32 @@
+"""Tabla processed_payments para idempotencia del webhook de Mercado Pago
+
+Revision ID: a6e4c8f2d0b7
+Revises: f3c9a1d7b285
+Create Date: 2026-10-16 14:21:06.873512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e4c8f2d0b7'
+down_revision: Union[str, Sequence[str], None] = 'f3c9a1d7b285'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('processed_payments',
+    sa.Column('payment_id', sa.Text(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('payment_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('processed_payments')
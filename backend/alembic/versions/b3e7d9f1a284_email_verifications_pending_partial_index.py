@@ -0,0 +1,37 @@
+"""Indice parcial de codigos pendientes en email_verifications
+
+Revision ID: b3e7d9f1a284
+Revises: a6e4c8f2d0b7
+Create Date: 2026-10-16 17:42:09.518273
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e7d9f1a284'
+down_revision: Union[str, Sequence[str], None] = 'a6e4c8f2d0b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Solo los códigos no usados: cubre el UPDATE que invalida los previos
+    # (user_id, used = false) y el "último pendiente" de verify_email_code
+    # (ORDER BY created_at DESC LIMIT 1) sin recorrer el historial del usuario
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_emailver_pending
+            ON email_verifications (user_id, created_at DESC)
+            WHERE used = false
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_emailver_pending")
@@ -0,0 +1,53 @@
+"""Indice compuesto para paginacion keyset de conversations
+
+Revision ID: b7d1e3a9c462
+Revises: 9f4c2b7e5d18
+Create Date: 2026-10-16 12:48:05.117350
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d1e3a9c462'
+down_revision: Union[str, Sequence[str], None] = '9f4c2b7e5d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # last_message_at es la clave del keyset: sin NULLs (en DESC irían primero,
+    # el cursor no podría codificarlos y tuple_ < cursor los descartaría)
+    op.execute("""
+        UPDATE conversations
+        SET last_message_at = COALESCE(created_at, timezone('utc', now()))
+        WHERE last_message_at IS NULL
+    """)
+    op.alter_column(
+        "conversations", "last_message_at",
+        existing_type=sa.DateTime(),
+        nullable=False,
+    )
+
+    # Cubre WHERE user_id/status + ORDER BY last_message_at DESC, id DESC
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS conv_user_status_lastmsg_idx
+            ON conversations (user_id, status, last_message_at DESC, id DESC)
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS conv_user_status_lastmsg_idx")
+
+    op.alter_column(
+        "conversations", "last_message_at",
+        existing_type=sa.DateTime(),
+        nullable=True,
+    )
@@ -0,0 +1,70 @@
+"""Indice unico lower(email) en users
+
+Revision ID: c4e1a7b9d2f3
+Revises: 41049d291f76
+Create Date: 2026-10-16 10:12:41.208335
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e1a7b9d2f3'
+down_revision: Union[str, Sequence[str], None] = '41049d291f76'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+
+    # El índice único anterior distinguía mayúsculas: si ya hay emails que solo
+    # difieren en eso, el índice no puede construirse. Abortar antes con detalle.
+    duplicates = bind.execute(sa.text("""
+        SELECT lower(email) AS email_lower, count(*) AS total
+        FROM users
+        GROUP BY lower(email)
+        HAVING count(*) > 1
+    """)).fetchall()
+    if duplicates:
+        listed = ", ".join(f"{row.email_lower} ({row.total})" for row in duplicates)
+        raise RuntimeError(
+            "No se puede crear ix_users_email_lower: hay emails que solo difieren "
+            f"en mayúsculas/minúsculas. Unificar estas cuentas antes de migrar: {listed}"
+        )
+
+    # Un CREATE INDEX CONCURRENTLY fallido deja el índice INVALID: se elimina
+    # para que la migración pueda reintentarse
+    invalid_leftover = bind.execute(sa.text("""
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = 'ix_users_email_lower' AND NOT i.indisvalid
+    """)).first()
+
+    # CONCURRENTLY no puede ejecutarse dentro de una transacción
+    with op.get_context().autocommit_block():
+        if invalid_leftover:
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_email_lower")
+        op.create_index(
+            'ix_users_email_lower',
+            'users',
+            [sa.text('lower(email)')],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_users_email_lower',
+            table_name='users',
+            postgresql_concurrently=True
+        )
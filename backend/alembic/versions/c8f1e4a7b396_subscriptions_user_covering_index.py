@@ -0,0 +1,38 @@
+"""Indice covering de subscriptions para los checks del middleware
+
+Revision ID: c8f1e4a7b396
+Revises: b3e7d9f1a284
+Create Date: 2026-10-16 19:06:44.730162
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8f1e4a7b396'
+down_revision: Union[str, Sequence[str], None] = 'b3e7d9f1a284'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # get_subscription_snapshot lee solo estas columnas por user_id: con
+    # INCLUDE la parte de subscriptions sale del índice (index-only scan).
+    # usage_limits no lleva índice covering a propósito: sus contadores cambian
+    # en cada turno y tenerlos en un índice impediría los HOT updates.
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subscriptions_user_cover
+            ON subscriptions (user_id)
+            INCLUDE (plan, status, trial_end, current_period_end, cancel_at_period_end)
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_subscriptions_user_cover")
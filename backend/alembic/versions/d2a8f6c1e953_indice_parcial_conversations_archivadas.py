@@ -0,0 +1,35 @@
+"""Indice parcial para conversaciones archivadas
+
+Revision ID: d2a8f6c1e953
+Revises: b7d1e3a9c462
+Create Date: 2026-10-16 13:34:52.640981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a8f6c1e953'
+down_revision: Union[str, Sequence[str], None] = 'b7d1e3a9c462'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Solo filas archivadas: índice pequeño que ya entrega el ORDER BY archived_at DESC
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS conv_archived_idx
+            ON conversations (user_id, archived_at DESC)
+            WHERE status = 'archived'
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS conv_archived_idx")
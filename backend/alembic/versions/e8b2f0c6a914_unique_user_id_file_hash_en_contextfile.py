@@ -0,0 +1,50 @@
+"""Unique (user_id, file_hash) en contextfile
+
+Revision ID: e8b2f0c6a914
+Revises: c4e1a7b9d2f3
+Create Date: 2026-10-16 11:02:17.554012
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b2f0c6a914'
+down_revision: Union[str, Sequence[str], None] = 'c4e1a7b9d2f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 1️⃣ Eliminar duplicados previos (se conserva el registro más antiguo).
+    #    El blob en GCS es el mismo para todos porque el path usa el hash.
+    op.execute("""
+        DELETE FROM contextfile
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY user_id, file_hash
+                    ORDER BY created_at NULLS LAST, id
+                ) AS rn
+                FROM contextfile
+                WHERE file_hash IS NOT NULL
+            ) ranked
+            WHERE ranked.rn > 1
+        )
+    """)
+
+    # 2️⃣ Crear la restricción única que usa ON CONFLICT
+    op.create_unique_constraint(
+        'uq_contextfile_user_id_file_hash',
+        'contextfile',
+        ['user_id', 'file_hash']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_contextfile_user_id_file_hash', 'contextfile', type_='unique')
@@ -0,0 +1,49 @@
+"""Indices parciales active/archived para listado de conversations
+
+Revision ID: f3c9a1d7b285
+Revises: d2a8f6c1e953
+Create Date: 2026-10-16 13:58:17.209334
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c9a1d7b285'
+down_revision: Union[str, Sequence[str], None] = 'd2a8f6c1e953'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Un índice pequeño por status: el listado (status=active por defecto)
+    # sale ordenado del índice, sin nodo Sort, incluido el desempate por id
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS conv_active_user_lastmsg_idx
+            ON conversations (user_id, last_message_at DESC, id DESC)
+            WHERE status = 'active'
+        """)
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS conv_archived_user_lastmsg_idx
+            ON conversations (user_id, last_message_at DESC, id DESC)
+            WHERE status = 'archived'
+        """)
+        # Redundante con los dos parciales (y status=all tampoco lo usa para
+        # ordenar): un índice menos que reescribir en cada turno de chat
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS conv_user_status_lastmsg_idx")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS conv_user_status_lastmsg_idx
+            ON conversations (user_id, status, last_message_at DESC, id DESC)
+        """)
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS conv_archived_user_lastmsg_idx")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS conv_active_user_lastmsg_idx")
@@ -10,16 +10,19 @@ _apr.AuthProviderRegistry = _DummyAuthProviderRegistry
 
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 from config import lifespan, logger
 from apps.api import auth, conversations, agentcontext, oauth, payments, mercadopago_webhook, sse_chat
-from config import FRONTEND_URL
+from config import FRONTEND_URL, METRICS_ENABLED
+from apps.core.dependencies import get_current_identity
+from apps.services.memory.qdrant_service import get_search_cache_stats
 import os
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends
 from slowapi.middleware import SlowAPIMiddleware
 from slowapi.errors import RateLimitExceeded
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 # Crear limiter
 from apps.core.limiter import limiter
@@ -28,7 +31,8 @@ app = FastAPI(
     title="Agente IA API",
     description="API para Agente de IA con soporte REST y SSE",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # UUID/datetime serializados en C
 )
 
 # Registrar limiter en app
@@ -36,6 +40,9 @@ app.state.limiter = limiter
 
 # Middleware
 app.add_middleware(SlowAPIMiddleware)
+# Comprime respuestas JSON grandes (listados de archivos/conversaciones).
+# Starlette excluye text/event-stream, así que el stream SSE no se bufferiza.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 # 🔥 MUY IMPORTANTE: handler de error
 @app.exception_handler(RateLimitExceeded)
@@ -58,6 +65,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Paginación keyset de /conversations
+    max_age=86400,  # Cachear preflight OPTIONS 24h en el navegador
 )
 
 # Incluir routers
@@ -73,6 +82,12 @@ app.include_router(sse_chat.router)
 async def health_check():
     return {"status": "healthy", "version": "2.0.0"}
 
+# Solo con METRICS_ENABLED=true y con un usuario autenticado
+if METRICS_ENABLED:
+    @app.get("/metrics", dependencies=[Depends(get_current_identity)])
+    async def metrics():
+        return {"search_context_cache": get_search_cache_stats()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app:app", host="0.0.0.0", port=5000)
@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, UploadFile, status,Form, File
 from sqlalchemy.orm import Session
-from typing import List
-from apps.core.dependencies import get_db, get_current_user
-from apps.models.user import User
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import List, BinaryIO
+from apps.core.dependencies import get_db, get_current_identity, get_current_user_id
+from apps.schemas.auth import UserIdentity
 from apps.models.conversation import Conversation
 from apps.models.context_file import ContextFile
-from apps.services.storage.gcs_service import upload_file, validate_pdf, generate_signed_url, delete_file
-from apps.schemas.agent_context import FilesDetail
+from apps.services.storage.gcs_service import upload_file_stream, validate_pdf, PDF_TRAILER_WINDOW, generate_signed_url, delete_file
+from apps.schemas.agent_context import FilesDetail, DeleteFilesRequest
 import uuid
 import os
+import asyncio
 import hashlib
+import logging
 from apps.middleware.subscription_middleware import (
     check_file_upload_limit,
     record_file_usage,
@@ -19,6 +23,24 @@ from apps.middleware.subscription_middleware import (
 from apps.core.limiter import limiter
 
 router = APIRouter(prefix="/agent/context", tags=["Agent Context"])
+logger = logging.getLogger(__name__)
+
+
+def _file_size(file_obj: BinaryIO) -> int:
+    """Tamaño de un file-like posicionándose al final (no lee contenido)"""
+    file_obj.seek(0, os.SEEK_END)
+    size = file_obj.tell()
+    file_obj.seek(0)
+    return size
+
+
+def _sha256_file(file_obj: BinaryIO) -> str:
+    """
+    SHA-256 de un file-like con hashlib.file_digest: el bucle de lectura y
+    actualización corre en C (OpenSSL, SHA-NI si la CPU lo soporta) sin
+    crear un objeto bytes por bloque.
+    """
+    return hashlib.file_digest(file_obj, "sha256").hexdigest()
 
 
 @router.post("/files")
@@ -26,86 +48,138 @@ router = APIRouter(prefix="/agent/context", tags=["Agent Context"])
 async def set_conversation_files(
     request: Request,
     files: List[UploadFile] = File(...),
-    current_user: User = Depends(get_current_user),
+    user_id: uuid.UUID = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
     # 1. Verificación de límites de suscripción (Tal cual lo tenías)
     try:
-        check_file_upload_limit(current_user.id, len(files), db)
+        check_file_upload_limit(user_id, len(files), db)
     except SubscriptionLimitError as e:
         raise HTTPException(status_code=403, detail={"message": e.message})
 
     # Configuraciones
     MAX_FILE_SIZE_MB = 10
+    MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+    MAX_CONCURRENT_UPLOADS = 16
     ALLOWED_MIME_TYPES = ["application/pdf"]
     saved_files = []
     skipped_duplicates = 0
 
+    # Primera pasada: tamaño + hash de cada archivo
+    pending = []
     for file in files:
         # A. Validación rápida de MIME Type
         if file.content_type not in ALLOWED_MIME_TYPES:
             continue # O lanza error si prefieres ser estricto
 
-        # B. Leer contenido y generar HASH
-        file_content = await file.read() # Importante usar await
-        file_hash = hashlib.sha256(file_content).hexdigest()
-        file_size = len(file_content)
+        # B. Tamaño sin leer el contenido: Starlette ya lo conoce al parsear
+        # el multipart, así que un archivo gigante se rechaza sin hashearlo.
+        file_size = file.size if file.size is not None else await asyncio.to_thread(_file_size, file.file)
+        if file_size > MAX_FILE_SIZE_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Archivo {file.filename} excede los {MAX_FILE_SIZE_MB}MB"
+            )
+
+        # Solo los extremos del archivo para validar que es un PDF
+        header = await file.read(8)
+        await file.seek(max(0, file_size - PDF_TRAILER_WINDOW))
+        trailer = await file.read(PDF_TRAILER_WINDOW)
+        await file.seek(0)
+        file_hash = await asyncio.to_thread(_sha256_file, file.file)
+
+        pending.append((file, file_hash, file_size, header, trailer))
 
-        # C. Verificar DUPLICADO en Base de Datos
-        existing_in_db = db.query(ContextFile).filter(
-            ContextFile.user_id == current_user.id,
-            ContextFile.file_hash == file_hash
-        ).first()
+    # C. Verificar DUPLICADOS en Base de Datos con una sola consulta
+    hashes = {file_hash for _, file_hash, _, _, _ in pending}
+    existing_hashes = set()
+    if hashes:
+        existing_hashes = {
+            row[0] for row in db.query(ContextFile.file_hash).filter(
+                ContextFile.user_id == user_id,
+                ContextFile.file_hash.in_(hashes)
+            ).all()
+        }
 
-        if existing_in_db:
+    to_upload = []
+    for file, file_hash, file_size, header, trailer in pending:
+        if file_hash in existing_hashes:
             skipped_duplicates += 1
             continue # Saltamos a la siguiente iteración
 
-        # D. Validaciones de integridad (PDF real y tamaño)
-        if not validate_pdf(file_content):
+        # D. Validación de integridad (PDF real)
+        if not validate_pdf(header, trailer):
             raise HTTPException(status_code=400, detail=f"Archivo {file.filename} no es un PDF válido")
 
-        if file_size > (MAX_FILE_SIZE_MB * 1024 * 1024):
-            raise HTTPException(status_code=400, detail=f"Archivo {file.filename} excede los {MAX_FILE_SIZE_MB}MB")
+        to_upload.append((file, file_hash, file_size))
+        # Evita registrar dos veces el mismo contenido dentro del mismo request
+        existing_hashes.add(file_hash)
 
-        # E. Subida a GCS (Ahora enviamos el file_hash)
-        upload_result = upload_file(
-            file_content=file_content,
-            user_id=str(current_user.id),
-            original_filename=file.filename,
-            file_hash=file_hash # <--- Pasamos el hash al service
-        )
+    # E. Subida a GCS en streaming, concurrente y acotada por semáforo
+    upload_semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
+
+    async def _upload(file: UploadFile, file_hash: str, file_size: int) -> dict:
+        async with upload_semaphore:
+            await file.seek(0)
+            return await asyncio.to_thread(
+                upload_file_stream,
+                file_obj=file.file,
+                user_id=str(user_id),
+                original_filename=file.filename,
+                file_hash=file_hash,
+                file_size=file_size
+            )
 
+    upload_results = await asyncio.gather(
+        *[_upload(file, file_hash, file_size) for file, file_hash, file_size in to_upload]
+    )
+
+    rows = []
+    for (file, file_hash, file_size), upload_result in zip(to_upload, upload_results):
         if not upload_result["success"]:
             continue # O manejar el error de GCS
 
-        # F. Registro en BD
-        new_file = ContextFile(
-            user_id=current_user.id,
-            name=file.filename,
-            mime_type=file.content_type,
-            file_size=file_size,
-            file_hash=file_hash, # <--- Guardamos el hash
-            gcs_path=upload_result["gcs_path"]
-        )
-        db.add(new_file)
-        saved_files.append(new_file)
+        # F. Fila a registrar en BD (inserción en bloque al final)
+        rows.append({
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "name": file.filename,
+            "mime_type": file.content_type,
+            "file_size": file_size,
+            "file_hash": file_hash,
+            "gcs_path": upload_result["gcs_path"]
+        })
 
-    # G. Finalización
-    if saved_files:
+    # G. Finalización: un solo INSERT multi-fila; los IDs se generan en cliente.
+    # ON CONFLICT (user_id, file_hash) resuelve de forma atómica la carrera con
+    # otro request concurrente que suba el mismo contenido: las filas que no
+    # vuelven en RETURNING ya existían. El blob en GCS se comparte (mismo path
+    # por hash), así que no hay nada que revertir.
+    if rows:
+        inserted = db.execute(
+            pg_insert(ContextFile)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["user_id", "file_hash"])
+            .returning(ContextFile.id)
+        ).scalars().all()
         db.commit()
-        # Refrescar para obtener los IDs generados
-        for f in saved_files: db.refresh(f)
-        record_file_usage(current_user.id, len(saved_files), db)
+
+        inserted_ids = set(inserted)
+        saved_files = [row for row in rows if row["id"] in inserted_ids]
+        skipped_duplicates += len(rows) - len(saved_files)
+
+        if saved_files and not record_file_usage(user_id, len(saved_files), db):
+            logger.warning("⚠️ Uso de archivos sin registrar para user_id=%s (%s archivo(s))",
+                           user_id, len(saved_files))
 
     return {
         "success": True,
         "message": f"Procesados: {len(saved_files)} subidos, {skipped_duplicates} duplicados omitidos.",
         "files": [
             {
-                "id": str(f.id),
-                "name": f.name,
-                "gcs_path": f.gcs_path
+                "id": f["id"],
+                "name": f["name"],
+                "gcs_path": f["gcs_path"]
             } for f in saved_files
         ]
     }
@@ -114,7 +188,7 @@ async def set_conversation_files(
 @limiter.limit("3/minute")
 async def get_files_uploaded(
     request:Request,
-    current_user: User = Depends(get_current_user),
+    user_id: uuid.UUID = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 
 ):
@@ -122,7 +196,7 @@ async def get_files_uploaded(
     
 
     files= db.query(ContextFile).filter(
-        ContextFile.user_id == current_user.id
+        ContextFile.user_id == user_id
     ).all()
 
     return{
@@ -134,7 +208,7 @@ async def get_files_uploaded(
 async def delete_files(
     request:Request,
     file_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ):
     """
@@ -172,4 +246,52 @@ async def delete_files(
     return {
         "success": True,
         "message": "Archivo eliminado permanentemente"
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/delete-files")
+@limiter.limit("3/minute")
+async def delete_files_batch(
+    request: Request,
+    payload: DeleteFilesRequest,
+    user_id: uuid.UUID = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """
+    Elimina varios archivos del contexto en una sola operación:
+    un DELETE ... RETURNING en BD y borrados concurrentes en GCS.
+    """
+    MAX_CONCURRENT_DELETES = 16
+
+    # Ownership validado en el WHERE (usuario + prefijo del path en GCS)
+    result = db.execute(
+        delete(ContextFile)
+        .where(
+            ContextFile.id.in_(payload.file_ids),
+            ContextFile.user_id == user_id,
+            ContextFile.gcs_path.startswith(f"users/{user_id}/")
+        )
+        .returning(ContextFile.id, ContextFile.gcs_path)
+    )
+    deleted = result.all()
+    db.commit()
+
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Archivos no encontrados"
+        )
+
+    delete_semaphore = asyncio.Semaphore(MAX_CONCURRENT_DELETES)
+
+    async def _delete(gcs_path: str) -> bool:
+        async with delete_semaphore:
+            return await asyncio.to_thread(delete_file, gcs_path)
+
+    await asyncio.gather(*[_delete(row.gcs_path) for row in deleted])
+
+    return {
+        "success": True,
+        "message": f"{len(deleted)} archivo(s) eliminado(s) permanentemente",
+        "deleted": [row.id for row in deleted]
+    }
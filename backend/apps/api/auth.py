@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, status, Response, Cookie
 from sqlalchemy.orm import Session
-from apps.core.dependencies import get_db, get_current_user, create_secure_token
+from sqlalchemy import func
+from apps.core.dependencies import get_db, get_current_user, create_secure_token, invalidate_user_cache
 from apps.core.security import (
-    verify_password, 
-    get_password_hash, 
+    verify_password_async,
+    get_password_hash_async,
+    password_needs_rehash,
     create_access_token, 
     create_refresh_token,
     decode_token, hash_code, COOKIE_SECURE, 
 )
 from apps.core.email_verification_service import create_email_verification, verify_email_code
 from apps.schemas.auth import UserRegister, UserLogin, Token, TokenRefresh, UserResponse, ForgotPasswordRequest, ResetPasswordRequest, DeleteAccountRequest, VerifyEmailRequest, ResendVerificationRequest, MessageResponse
+from apps.schemas.orm import fast_from_orm
 from apps.models.user import User
 from datetime import datetime, timedelta
 from apps.core.send_email import send_reset_email, send_delete_account_email, send_verification_email
@@ -34,17 +37,18 @@ async def register(
     Registrar nuevo usuario
     """
     # Verificar si el email ya existe
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = db.query(User).filter(func.lower(User.email) == user_data.email.lower()).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El email ya está registrado"
         )
     
-    # Crear usuario
+    # Crear usuario (el hashing es CPU-bound: se ejecuta fuera del event loop)
+    password_hash = await get_password_hash_async(user_data.password)
     new_user = User(
-        email=user_data.email,
-        password_hash=get_password_hash(user_data.password),
+        email=user_data.email.lower(),  # normalizado: coincide con ix_users_email_lower
+        password_hash=password_hash,
         name=user_data.name,
         is_active=True,
         is_verified=False
@@ -76,9 +80,14 @@ async def login(
     response: Response, db: 
     Session = Depends(get_db)):
     """Login de usuario"""
-    user = db.query(User).filter(User.email == credentials.email).first()
+    user = db.query(User).filter(func.lower(User.email) == credentials.email.lower()).first()
     
-    if not user or not verify_password(credentials.password, user.password_hash):
+    # El hashing es CPU-bound: se ejecuta fuera del event loop
+    password_ok = user is not None and await verify_password_async(
+        credentials.password, user.password_hash
+    )
+
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o contraseña incorrectos",
@@ -98,6 +107,10 @@ async def login(
         )
     
     user.last_login = datetime.utcnow()
+
+    # Migración transparente: bcrypt (o Argon2id con parámetros viejos) → actual
+    if password_needs_rehash(user.password_hash):
+        user.password_hash = await get_password_hash_async(credentials.password)
     
     
     # Crear tokens
@@ -206,7 +219,7 @@ async def resend_code(
     db: Session = Depends(get_db)
 ):
     email = payload.email
-    user = db.query(User).filter(User.email == email).first()
+    user = db.query(User).filter(func.lower(User.email) == email.lower()).first()
 
     if not user:
         raise HTTPException(
@@ -265,6 +278,7 @@ async def logout(
     """Logout - eliminar refresh token"""
     current_user.refresh_token_hash = None
     db.commit()
+    await invalidate_user_cache(current_user.id)
     response.delete_cookie(key="refresh_token")
     return {"message": "Logout exitoso"}
 
@@ -274,7 +288,10 @@ async def get_me(current_user: User = Depends(get_current_user)):
     """
     Obtener información del usuario actual
     """
-    return current_user
+    return Response(
+        content=fast_from_orm(UserResponse, current_user).model_dump_json(),
+        media_type="application/json",
+    )
 
 
 @router.post("/forgot-password")
@@ -285,7 +302,7 @@ async def forgot_password(
     db: Session = Depends(get_db)):
 
     email= payload.email
-    user = db.query(User).filter(User.email == email).first()
+    user = db.query(User).filter(func.lower(User.email) == email.lower()).first()
 
     # Respuesta genérica por seguridad
     if not user:
@@ -325,7 +342,7 @@ async def reset_password(
             detail="Este enlace es inválido o ha expirado"
         )
 
-    user.password_hash = get_password_hash(payload.new_password)
+    user.password_hash = await get_password_hash_async(payload.new_password)
     user.reset_password_token = None
     user.reset_password_expires = None
 
@@ -389,6 +406,7 @@ async def confirm_account_deletion(
         # Eliminación total (CASCADE hace el resto)
         db.delete(user)
         db.commit()
+        await invalidate_user_cache(user.id)
 
     except Exception as e:
         db.rollback()
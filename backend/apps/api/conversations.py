@@ -1,30 +1,144 @@
-from fastapi import APIRouter, Request, Depends, HTTPException, status, Query 
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, or_
-from apps.core.dependencies import get_db, get_current_user
-from apps.models.user import User
+from fastapi import APIRouter, Request, Response, Depends, HTTPException, status, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session, selectinload, raiseload
+from sqlalchemy import desc, or_, func, select, update, union, tuple_, lambda_stmt
+from apps.core.dependencies import get_db, get_current_identity
+from apps.schemas.auth import UserIdentity
 from apps.models.conversation import Conversation
 from apps.models.message import Message
-from typing import List, Optional, Literal
+from typing import List, Optional, Literal, Tuple
 from pydantic import BaseModel
 from datetime import datetime
+import base64
+import orjson
 import uuid
-from apps.schemas.conversation import ConversationListItem, ConversationDetail
+from apps.schemas.conversation import ConversationListItem, ConversationDetail, MessageItem
+from apps.schemas.orm import fast_from_orm
+from apps.services.conversation.list_cache import (
+    first_page_key,
+    get_cached_first_page,
+    cache_first_page,
+    invalidate_conversation_list,
+)
 
 from apps.core.limiter import limiter
 
 router = APIRouter(prefix="/conversations", tags=["Conversations"])
 
 
+FIRST_PAGE_SIZE = 50
+
+# Columnas de ConversationListItem: los listados se leen como tuplas, sin
+# instanciar el modelo ORM, y se serializan directo con orjson
+_LIST_ITEM_COLUMNS = (
+    Conversation.id,
+    Conversation.title,
+    Conversation.status,
+    Conversation.message_count,
+    Conversation.last_message_at,
+    Conversation.created_at,
+)
+
+
+def _model_response(model: BaseModel, headers: Optional[dict] = None) -> Response:
+    """
+    Serializa con pydantic-core y devuelve la respuesta ya armada: FastAPI
+    no vuelve a validar contra response_model ni pasa por jsonable_encoder.
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json", headers=headers)
+
+
+def _list_response(rows, headers: Optional[dict] = None) -> Response:
+    # Las filas ya traen exactamente las columnas de ConversationListItem con
+    # sus tipos de BD: orjson las serializa en una sola pasada en C (UUID y
+    # datetime nativos), sin la validación de pydantic por fila
+    body = orjson.dumps([row._asdict() for row in rows])
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _title_tsvector():
+    """Misma expresión que el índice ix_conversations_title_tsv (debe coincidir)"""
+    return func.to_tsvector("spanish", func.coalesce(Conversation.title, ""))
+
+
+def _owned_conversation_stmt(conversation_id: uuid.UUID, user_id: uuid.UUID, with_messages: bool = False):
+    """
+    SELECT de una conversación del usuario como lambda_stmt: el SQL se
+    compila una vez y se reutiliza, ids entran como parámetros.
+    raiseload('*') hace que cualquier carga implícita de relaciones falle.
+    """
+    stmt = lambda_stmt(
+        lambda: select(Conversation).where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == user_id
+        )
+    )
+    if with_messages:
+        stmt += lambda s: s.options(selectinload(Conversation.messages), raiseload("*"))
+    else:
+        stmt += lambda s: s.options(raiseload("*"))
+    return stmt
+
+
+def _list_conversations_stmt(
+    user_id: uuid.UUID,
+    status: str,
+    limit: int,
+    after: Optional[Tuple[datetime, uuid.UUID]] = None
+):
+    """
+    Página del listado como lambda_stmt (SQL cacheado por combinación de
+    filtros; user_id/status/cursor/limit van como parámetros)
+    """
+    stmt = lambda_stmt(
+        lambda: select(
+            Conversation.id,
+            Conversation.title,
+            Conversation.status,
+            Conversation.message_count,
+            Conversation.last_message_at,
+            Conversation.created_at,
+        ).where(Conversation.user_id == user_id)
+    )
+    if status != "all":
+        stmt += lambda s: s.where(Conversation.status == status)
+    if after:
+        cursor_ts, cursor_id = after
+        stmt += lambda s: s.where(
+            tuple_(Conversation.last_message_at, Conversation.id) < tuple_(cursor_ts, cursor_id)
+        )
+    stmt += lambda s: s.order_by(
+        desc(Conversation.last_message_at), desc(Conversation.id)
+    ).limit(limit)
+    return stmt
+
+
+def _encode_cursor(conversation) -> str:
+    """Cursor opaco de keyset: (last_message_at, id) del último elemento"""
+    raw = f"{conversation.last_message_at.isoformat()}|{conversation.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        ts, conv_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(ts), uuid.UUID(conv_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido"
+        )
+
+
 # Endpoints
 @router.get("", response_model=List[ConversationListItem])
 @limiter.limit("15/minute")
 async def list_conversations(
     request:Request,
     status: Literal["active", "archived", "all"] = Query("active"),
-    limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0),
-    current_user: User = Depends(get_current_user),
+    limit: int = Query(FIRST_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session =Depends(get_db),
 ):
     """
@@ -32,24 +146,102 @@ async def list_conversations(
     - active (default)
     - archived
     - all
+
+    Paginación por keyset: si hay más resultados, el header `X-Next-Cursor`
+    trae el valor a enviar como `cursor` en la siguiente petición.
+    """
+    # Primera página (la que pide el frontend en cada recarga): servida desde Redis
+    # La clave versionada se fija antes de la consulta y se reutiliza al cachear
+    page_key = None
+    if cursor is None and limit == FIRST_PAGE_SIZE:
+        page_key = await first_page_key(current_user.id, status)
+    if page_key:
+        cached = await get_cached_first_page(page_key)
+        if cached:
+            body, next_cursor = cached
+            headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+            return Response(content=body, media_type="application/json", headers=headers)
+
+    conversations = db.execute(
+        _list_conversations_stmt(
+            current_user.id,
+            status,
+            limit,
+            _decode_cursor(cursor) if cursor else None
+        )
+    ).all()
+
+    next_cursor = _encode_cursor(conversations[-1]) if len(conversations) == limit else None
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    response = _list_response(conversations, headers)
+
+    if page_key:
+        await cache_first_page(page_key, response.body, next_cursor)
+
+    return response
+
+
+# ⚠️ Rutas fijas (/search, /archived) antes de /{conversation_id}: si no,
+# FastAPI intenta parsearlas como UUID y responde 422.
+@router.get("/search", response_model=List[ConversationListItem])
+@limiter.limit("5/minute")
+async def search_conversations(
+    request:Request,
+    q: str = Query(..., min_length=1),
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    """
+    Busca conversaciones por título o contenido de mensajes
     """
-    query = (
-        db.query(Conversation)
-        .filter(Conversation.user_id == current_user.id)
+    tsquery = func.plainto_tsquery("spanish", q)
+
+    # Títulos: substring vía índice GIN trigram sobre lower(title)
+    # o coincidencia por palabras vía índice GIN to_tsvector('spanish', title)
+    title_ids = select(Conversation.id).where(
+        Conversation.user_id == current_user.id,
+        or_(
+            func.lower(Conversation.title).contains(q.lower(), autoescape=True),
+            _title_tsvector().op("@@")(tsquery)
+        )
     )
 
-    if status != "all":
-        query = query.filter(Conversation.status == status)
+    # Contenido de mensajes: columna precalculada messages.search_tsv (GIN)
+    body_ids = select(Message.conversation_id).join(
+        Conversation, Conversation.id == Message.conversation_id
+    ).where(
+        Conversation.user_id == current_user.id,
+        Message.search_tsv.op("@@")(tsquery)
+    )
+
+    matching_ids = union(title_ids, body_ids).subquery()
 
-    conversations = (
-        query
+    conversations = db.execute(
+        select(*_LIST_ITEM_COLUMNS)
+        .where(Conversation.id.in_(select(matching_ids.c[0])))
         .order_by(desc(Conversation.last_message_at))
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
+        .limit(20)
+    ).all()
+    
+    return _list_response(conversations)
+
 
-    return conversations
+@router.get("/archived")
+@limiter.limit("5/minute")
+def get_archived_conversations(
+    request:Request,
+    current_user: UserIdentity = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):  
+    """Obtiene Conversaciones Archivadas (índice parcial conv_archived_idx)"""
+    return db.execute(
+        select(Conversation)
+        .where(
+            Conversation.user_id == current_user.id,
+            Conversation.status == "archived"
+        )
+        .order_by(Conversation.archived_at.desc())
+    ).scalars().all()
 
 
 @router.get("/{conversation_id}", response_model=ConversationDetail)
@@ -57,16 +249,16 @@ async def list_conversations(
 async def get_conversation(
     request:Request,
     conversation_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ): 
     """
     Obtiene una conversación específica con todos sus mensajes
     """
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
+    # Conversación + mensajes (selectinload, ya ordenados por created_at)
+    conversation = db.execute(
+        _owned_conversation_stmt(conversation_id, current_user.id, with_messages=True)
+    ).scalar_one_or_none()
     
     if not conversation:
         raise HTTPException(
@@ -74,27 +266,18 @@ async def get_conversation(
             detail="Conversación no encontrada"
         )
     
-    # Obtener mensajes
-    messages = db.query(Message).filter(
-        Message.conversation_id == conversation_id
-    ).order_by(Message.created_at).all()
-    
-    return ConversationDetail(
-        id=conversation.id,
-        title=conversation.title,
-        status=conversation.status,
-        message_count=conversation.message_count,
-        created_at=conversation.created_at,
-        last_message_at=conversation.last_message_at,
-        messages=messages
-    )
+    return _model_response(fast_from_orm(
+        ConversationDetail,
+        conversation,
+        messages=[fast_from_orm(MessageItem, m) for m in conversation.messages],
+    ))
 
 
 @router.post("", response_model=ConversationListItem)
 @limiter.limit("10/minute")
 async def create_conversation(
     request:Request,
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ):
     """
@@ -107,9 +290,10 @@ async def create_conversation(
     )
     db.add(new_conversation)
     db.commit()
+    await invalidate_conversation_list(current_user.id)
     db.refresh(new_conversation)
     
-    return new_conversation
+    return _model_response(fast_from_orm(ConversationListItem, new_conversation))
 
 
 @router.post("/{conversation_id}/archive")
@@ -117,34 +301,48 @@ async def create_conversation(
 async def archive_conversation(
     request:Request,
     conversation_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ):
     """
     Archiva una conversación
     """
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
-    
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversación no encontrada"
+    # Un solo UPDATE condicional; sin ventana entre la lectura y la escritura
+    archived_id = db.execute(
+        update(Conversation)
+        .where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == current_user.id,
+            Conversation.status != "archived"
         )
+        .values(status="archived", archived_at=datetime.utcnow())
+        .returning(Conversation.id)
+    ).scalar_one_or_none()
+
+    if archived_id is None:
+        # Solo en el caso de error: distinguir 404 de "ya archivada"
+        exists = db.execute(
+            select(Conversation.id).where(
+                Conversation.id == conversation_id,
+                Conversation.user_id == current_user.id
+            )
+        ).first()
+
+        if not exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversación no encontrada"
+            )
 
-    if conversation.status == "archived":
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="La conversación ya está archivada"
         )
-    
-    conversation.status = 'archived'
-    conversation.archived_at = datetime.utcnow() 
+
     db.commit()
+    await invalidate_conversation_list(current_user.id)
     
-    return {"success": True, "message": "Conversación archivada"}
+    return ORJSONResponse({"success": True, "message": "Conversación archivada"})
 
 
 @router.delete("/{conversation_id}/delete-permanent")
@@ -152,16 +350,15 @@ async def archive_conversation(
 async def delete_conversation_permanently(
     request:Request,
     conversation_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ):
     """
     Elimina una conversación definitivamente
     """
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
+    conversation = db.execute(
+        _owned_conversation_stmt(conversation_id, current_user.id)
+    ).scalar_one_or_none()
 
     if not conversation:
         raise HTTPException(
@@ -172,70 +369,39 @@ async def delete_conversation_permanently(
     # ⚠️ Eliminación definitiva
     db.delete(conversation)
     db.commit()
+    await invalidate_conversation_list(current_user.id)
 
-    return {
+    return ORJSONResponse({
         "success": True,
         "message": "Conversación eliminada permanentemente"
-    }
-
-
-
-@router.get("/search", response_model=List[ConversationListItem])
-@limiter.limit("5/minute")
-async def search_conversations(
-    request:Request,
-    q: str = Query(..., min_length=1),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """
-    Busca conversaciones por título o contenido de mensajes
-    """
-    # Buscar en títulos
-    conversations = db.query(Conversation).filter(
-        Conversation.user_id == current_user.id,
-        Conversation.title.ilike(f"%{q}%")
-    ).order_by(desc(Conversation.last_message_at)).limit(20).all()
-    
-    return conversations
-
-
-@router.get("/archived")
-@limiter.limit("5/minute")
-def get_archived_conversations(
-    request:Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):  
-    """Obtiene Conversaciones Archivadas"""
-    return db.query(Conversation).filter(
-        Conversation.user_id == current_user.id,
-        Conversation.status == "archived"
-    ).order_by(Conversation.archived_at.desc()).all()
-
+    })
 
 
 @router.patch("/{conversation_id}/restore")
 @limiter.limit("5/minute")
-def restore_conversation(
+async def restore_conversation(
     request:Request,
     conversation_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ):
     """Permite desarchivar una conversacion"""
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id,
-        Conversation.status == "archived"
-    ).first()
+    restored_id = db.execute(
+        update(Conversation)
+        .where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == current_user.id,
+            Conversation.status == "archived"
+        )
+        .values(status="active", archived_at=None)
+        .returning(Conversation.id)
+    ).scalar_one_or_none()
 
-    if not conversation:
+    if restored_id is None:
         raise HTTPException(404, "Conversación no encontrada o no archivada")
 
-    conversation.status = "active"
-    conversation.archived_at = None
     db.commit()
+    await invalidate_conversation_list(current_user.id)
 
-    return {"message": "Conversación restaurada"}
+    return ORJSONResponse({"message": "Conversación restaurada"})
 
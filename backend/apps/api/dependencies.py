@@ -6,10 +6,11 @@ Funciones de autenticación reutilizables para HTTP y WebSocket
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from apps.core.security import decode_token
-from apps.models.user import User
+from apps.core.dependencies import load_user_identity
+from apps.schemas.auth import UserIdentity
 
 
-async def get_user_from_token(token: str, db: Session) -> User:
+async def get_user_from_token(token: str, db: Session) -> UserIdentity:
     """
     Valida un JWT token y retorna el usuario.
     Reutilizable para HTTP (via HTTPBearer) y WebSocket (via query params).
@@ -19,7 +20,7 @@ async def get_user_from_token(token: str, db: Session) -> User:
         db: Sesión de base de datos
         
     Returns:
-        User: Usuario autenticado
+        UserIdentity: Identidad del usuario autenticado (cacheada en Redis)
         
     Raises:
         HTTPException: Si el token es inválido o el usuario no existe/inactivo
@@ -42,8 +43,8 @@ async def get_user_from_token(token: str, db: Session) -> User:
     if user_id is None or token_type != "access":
         raise credentials_exception
     
-    # Buscar usuario en BD
-    user = db.query(User).filter(User.id == user_id).first()
+    # Buscar usuario (Redis, o BD si no está cacheado)
+    user = await load_user_identity(payload, db)
     
     if user is None:
         raise credentials_exception
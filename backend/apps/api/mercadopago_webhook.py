@@ -3,27 +3,38 @@ mercadopago_webhook.py
 Endpoints para recibir webhooks de Mercado Pago
 """
 
-from fastapi import APIRouter, Request, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Request, HTTPException, BackgroundTasks
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from apps.database import SessionLocal
+from apps.models.processed_payment import ProcessedPayment
 from apps.services.payments.mercadopago_service import process_webhook_notification
 from apps.services.payments.subscription_service import (
-    upgrade_to_pro,
-    get_user_subscription
+    upgrade_to_pro
 )
 from datetime import datetime, timedelta
+import logging
 import uuid
 import hmac
-import hashlib
+import re
 import os
+from config import MERCADOPAGO_WEBHOOK_KEY_PROD
 
 router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
 
+logger = logging.getLogger(__name__)
+
+# Clave HMAC y parser de X-Signature preparados una sola vez al importar
+_WEBHOOK_KEY = MERCADOPAGO_WEBHOOK_KEY_PROD.encode() if MERCADOPAGO_WEBHOOK_KEY_PROD else None
+_SIG_PART_RE = re.compile(r"(\w+)=([^,]+)")
+
 
 @router.post("/mercadopago")
-async def mercadopago_webhook(request: Request):
+async def mercadopago_webhook(request: Request, background_tasks: BackgroundTasks):
     """
-    Recibe y procesa webhooks de Mercado Pago con validación de firma
+    Recibe webhooks de Mercado Pago con validación de firma.
+    Responde de inmediato; la consulta del pago y el upgrade a Pro se
+    procesan en background para que MP no reintente por timeout.
     """
     try:
         # Leer payload
@@ -34,96 +45,122 @@ async def mercadopago_webhook(request: Request):
         x_signature = request.headers.get("x-signature")
         x_request_id = request.headers.get("x-request-id")
         
-        print(f"📨 Webhook Mercado Pago recibido")
-        print(f"🔒 X-Signature: {x_signature}")
-        print(f"🆔 X-Request-ID: {x_request_id}")
+        logger.debug("📨 Webhook Mercado Pago recibido signature=%s request_id=%s", x_signature, x_request_id)
         
         # Validar firma del webhook
         if not verify_webhook_signature(body, x_signature, x_request_id):
-            print("❌ Firma de webhook inválida")
+            logger.warning("❌ Firma de webhook inválida request_id=%s", x_request_id)
             raise HTTPException(status_code=401, detail="Invalid webhook signature")
         
-        print("✅ Firma de webhook verificada")
-        
         # Mercado Pago envía diferentes tipos de notificaciones
         notification_type = data.get("type")
         
-        print(f"📨 Tipo de notificación: {notification_type}")
-        
         # Solo procesar pagos
         if notification_type != "payment":
-            print(f"⚠️ Tipo de notificación no manejado: {notification_type}")
-            return {"status": "ignored"}
+            logger.debug("⚠️ Tipo de notificación no manejado: %s", notification_type)
+            return ORJSONResponse({"status": "ignored"})
+        
+        background_tasks.add_task(_process_payment_notification, data)
         
-        # Procesar notificación de pago
+        return ORJSONResponse({"status": "accepted"})
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("❌ Error procesando webhook de Mercado Pago: %s", e)
+        return ORJSONResponse({"status": "error", "message": str(e)})
+
+
+def _process_payment_notification(data: dict) -> None:
+    """
+    Procesa una notificación de pago ya validada (corre en background,
+    en el threadpool de Starlette): consulta el pago en MP y, si fue
+    aprobado, activa el plan Pro.
+    """
+    try:
         result = process_webhook_notification(data)
         
         if not result["success"]:
-            print(f"❌ Error procesando webhook: {result.get('error')}")
-            return {"status": "error", "message": result.get("error")}
+            logger.error("❌ Error procesando webhook: %s", result.get("error"))
+            return
         
         payment_info = result["payment_info"]
         
-        print(f"💳 Estado del pago: {payment_info['status']}")
-        print(f"💳 Método de pago: {payment_info.get('payment_method_id')}")
-        print(f"💳 Monto: {payment_info.get('transaction_amount')} {payment_info.get('currency_id')}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "💳 Pago %s status=%s method=%s amount=%s %s",
+                payment_info.get("id"),
+                payment_info["status"],
+                payment_info.get("payment_method_id"),
+                payment_info.get("transaction_amount"),
+                payment_info.get("currency_id"),
+            )
         
         # Solo actualizar si el pago fue aprobado
         if payment_info["status"] == "approved":
             user_id = payment_info.get("external_reference") or payment_info["metadata"].get("user_id")
             
             if not user_id:
-                print("⚠️ No user_id en external_reference ni metadata")
-                return {"status": "error", "message": "No user_id found"}
-            
-            print(f"✅ Pago aprobado para usuario: {user_id}")
+                logger.warning("⚠️ Pago %s sin user_id en external_reference ni metadata", payment_info.get("id"))
+                return
             
-            # Upgrade a Pro
-            db = SessionLocal()
-            try:
-                # Crear periodo de 30 días
-                now = datetime.utcnow()
-                next_month = now + timedelta(days=30)
-                
-                upgrade_to_pro(
-                    user_id=uuid.UUID(user_id),
-                    payment_customer_reference=payment_info.get("payer_email"),
-                    payment_transaction_id=str(payment_info["id"]),
-                    current_period_start=now,
-                    current_period_end=next_month,
-                    db=db
-                )
-
-                
-                print(f"✅ Usuario {user_id} actualizado a Pro (Mercado Pago)")
-                
-                db.commit()
-                
-            except Exception as e:
-                print(f"❌ Error actualizando usuario a Pro: {e}")
-                import traceback
-                traceback.print_exc()
-                db.rollback()
-                return {"status": "error", "message": str(e)}
-            
-            finally:
-                db.close()
+            if _apply_pro_upgrade(user_id, payment_info):
+                logger.info("✅ Usuario %s actualizado a Pro (Mercado Pago)", user_id)
+            else:
+                logger.info("ℹ️ Pago %s ya aplicado, se ignora el reintento", payment_info["id"])
         
         elif payment_info["status"] == "pending":
-            print(f"⏳ Pago pendiente (puede ser PSE esperando confirmación)")
+            logger.debug("⏳ Pago %s pendiente (puede ser PSE esperando confirmación)", payment_info.get("id"))
         
         elif payment_info["status"] in ["rejected", "cancelled"]:
-            print(f"❌ Pago {payment_info['status']}: {payment_info.get('status_detail')}")
-        
-        return {"status": "success"}
+            logger.info("❌ Pago %s %s: %s", payment_info.get("id"), payment_info["status"], payment_info.get("status_detail"))
     
-    except HTTPException:
-        raise
     except Exception as e:
-        print(f"❌ Error procesando webhook de Mercado Pago: {e}")
-        import traceback
-        traceback.print_exc()
-        return {"status": "error", "message": str(e)}
+        logger.exception("❌ Error procesando pago de Mercado Pago: %s", e)
+
+
+def _apply_pro_upgrade(user_id: str, payment_info: dict) -> bool:
+    """
+    Activa el plan Pro en su propia sesión.
+
+    Returns:
+        False si el pago ya estaba aplicado (reintento de MP), True si se aplicó
+    """
+    db = SessionLocal()
+    try:
+        transaction_id = str(payment_info["id"])
+
+        # Idempotencia: MP reintenta el mismo pago. El registro va en la misma
+        # transacción que el upgrade; si este falla, el rollback lo deshace.
+        claimed = db.execute(
+            pg_insert(ProcessedPayment)
+            .values(payment_id=transaction_id)
+            .on_conflict_do_nothing(index_elements=["payment_id"])
+            .returning(ProcessedPayment.payment_id)
+        ).scalar_one_or_none()
+
+        if claimed is None:
+            return False
+
+        # Crear periodo de 30 días
+        now = datetime.utcnow()
+        next_month = now + timedelta(days=30)
+
+        upgrade_to_pro(
+            user_id=uuid.UUID(user_id),
+            payment_customer_reference=payment_info.get("payer_email"),
+            payment_transaction_id=transaction_id,
+            current_period_start=now,
+            current_period_end=next_month,
+            db=db
+        )
+        db.commit()
+        return True
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
 
 def verify_webhook_signature(payload: bytes, x_signature: str, x_request_id: str) -> bool:
@@ -138,59 +175,43 @@ def verify_webhook_signature(payload: bytes, x_signature: str, x_request_id: str
     Returns:
         True si la firma es válida, False si no
     """
-    from config import MERCADOPAGO_WEBHOOK_KEY_PROD
-    webhook_secret = MERCADOPAGO_WEBHOOK_KEY_PROD
-    
-    if not webhook_secret:
-        print("⚠️ MERCADOPAGO_WEBHOOK_SECRET no configurado")
+    if not _WEBHOOK_KEY:
+        logger.warning("⚠️ MERCADOPAGO_WEBHOOK_SECRET no configurado")
         # En desarrollo puedes permitir webhooks sin validación
         # En producción SIEMPRE debe estar configurado
         return True  # ← Cambiar a False en producción
     
     if not x_signature or not x_request_id:
-        print("⚠️ Headers X-Signature o X-Request-ID faltantes")
+        logger.warning("⚠️ Headers X-Signature o X-Request-ID faltantes")
         return False
     
     try:
         # Extraer ts y v1 del header X-Signature
-        # Formato: "ts=1234567890,v1=hash_value"
-        parts = {}
-        for part in x_signature.split(","):
-            key, value = part.split("=")
-            parts[key] = value
-        
-        ts = parts.get("ts")
-        v1_hash = parts.get("v1")
+        # Formato: "ts=1234567890,v1=hash_value" (el orden de las partes no importa)
+        parts = dict(_SIG_PART_RE.findall(x_signature))
+        ts = parts.get("ts", "").strip()
+        v1_hash = parts.get("v1", "").strip().lower()
         
         if not ts or not v1_hash:
-            print("⚠️ X-Signature mal formado")
+            logger.warning("⚠️ X-Signature mal formado")
             return False
         
-        # Construir string para validar
+        # Calcular HMAC SHA256 sobre el manifest
         # Formato: id:{request_id};request-id:{request_id};ts:{timestamp};
-        manifest = f"id:{x_request_id};request-id:{x_request_id};ts:{ts};"
-        
-        # Calcular HMAC SHA256
-        hmac_obj = hmac.new(
-            webhook_secret.encode('utf-8'),
-            manifest.encode('utf-8'),
-            hashlib.sha256
-        )
+        # hmac.digest: una sola llamada a OpenSSL, sin objeto HMAC intermedio
+        request_id = x_request_id.encode()
+        manifest = b"id:%b;request-id:%b;ts:%b;" % (request_id, request_id, ts.encode())
         
-        computed_hash = hmac_obj.hexdigest()
+        computed_hash = hmac.digest(_WEBHOOK_KEY, manifest, "sha256").hex()
         
         # Comparar hashes
         is_valid = hmac.compare_digest(computed_hash, v1_hash)
         
-        if is_valid:
-            print(f"✅ Firma válida")
-        else:
-            print(f"❌ Firma inválida")
-            print(f"   Esperado: {v1_hash}")
-            print(f"   Calculado: {computed_hash}")
+        if not is_valid:
+            logger.debug("❌ Firma inválida esperado=%s calculado=%s", v1_hash, computed_hash)
         
         return is_valid
     
     except Exception as e:
-        print(f"❌ Error validando firma: {e}")
-        return False
\ No newline at end of file
+        logger.warning("❌ Error validando firma: %s", e)
+        return False
@@ -1,23 +1,100 @@
-from fastapi import APIRouter, Request, Depends, HTTPException, status, Query, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Request, Response, Depends, HTTPException, status, Query
+from fastapi.responses import HTMLResponse, ORJSONResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
-
-from apps.core.dependencies import get_db, get_current_user
+from functools import lru_cache
+from pathlib import Path
+from string import Template
+import html
+import json
+import logging
+from pydantic import TypeAdapter
+
+from apps.core.dependencies import get_db, get_current_identity
 from apps.services.oauth.oauth_service import oauth_service
 from apps.schemas.oauth import (
     OAuthConnectResponse,
     OAuthConnectionResponse
 )
-from apps.models.user import User
+from apps.schemas.auth import UserIdentity
+from apps.schemas.orm import fast_from_orm
 from apps.models.oauth_connection import OAuthConnection
 #from tools.App_Drive.dic_drive_tool import DriveService
 from apps.services.oauth.utils import get_integration_config
+from apps.redis_client import redis
+from apps.services.oauth.connections_cache import (
+    OAUTH_CONNECTIONS_CACHE_TTL,
+    connections_cache_key,
+    invalidate_connections_cache,
+)
 from config import FRONTEND_URL
 
 from apps.core.limiter import limiter
 
 router = APIRouter(prefix="/oauth", tags=["OAuth"])
+logger = logging.getLogger(__name__)
+
+# Página de cierre del popup OAuth: plantilla estática cargada una vez; los
+# datos viajan como JSON en un <script type="application/json">, nunca
+# interpolados en el JS.
+_CALLBACK_TMPL = Template(
+    (Path(__file__).resolve().parents[2] / "templates" / "oauth_ok.html").read_text(encoding="utf-8")
+)
+
+
+@lru_cache(maxsize=1024)
+def _render_callback_page(integration: str, email: str) -> bytes:
+    data = json.dumps(
+        {"app": integration, "email": email, "origin": FRONTEND_URL},
+        separators=(",", ":"),
+    ).replace("<", "\\u003c")  # Evita cerrar el <script> desde los datos
+    return _CALLBACK_TMPL.substitute(
+        app_name=html.escape(integration.capitalize()),
+        data=data,
+    ).encode("utf-8")
+
+
+# Conexiones activas por usuario cacheadas en Redis (ver connections_cache)
+_connections_adapter = TypeAdapter(List[OAuthConnectionResponse])
+
+
+async def _load_active_connections(user_id, db: Session):
+    """
+    JSON de las conexiones OAuth activas del usuario (Redis primero, luego BD).
+    Con cache hit se devuelve el JSON tal cual, sin validar ni re-serializar.
+    """
+    key = connections_cache_key(user_id)
+
+    try:
+        cached = await redis.get(key)
+        if cached:
+            return cached
+    except Exception as e:
+        logger.warning("⚠️ Redis no disponible para conexiones OAuth: %s", e)
+
+    # Filas de BD: se construyen sin validar (el campo `service` es `integration` en el modelo)
+    body = _connections_adapter.dump_json([
+        fast_from_orm(OAuthConnectionResponse, conn, service=conn.integration)
+        for conn in db.execute(
+            select(OAuthConnection).where(
+                OAuthConnection.user_id == user_id,
+                OAuthConnection.is_active == True
+            )
+        ).scalars()
+    ])
+
+    try:
+        await redis.set(key, body, ex=OAUTH_CONNECTIONS_CACHE_TTL)
+    except Exception as e:
+        logger.warning("⚠️ Error cacheando conexiones OAuth: %s", e)
+
+    return body
+
+
+async def _get_active_connections(user_id, db: Session) -> List[OAuthConnectionResponse]:
+    """Conexiones OAuth activas del usuario como modelos"""
+    return _connections_adapter.validate_json(await _load_active_connections(user_id, db))
 
 
 @router.get("/{integration}/connect", response_model=OAuthConnectResponse)
@@ -25,7 +102,7 @@ router = APIRouter(prefix="/oauth", tags=["OAuth"])
 async def connect_service(
     request:Request,
     integration: str,
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)  # Ya lo tienes
 ):
     """
@@ -54,6 +131,7 @@ async def connect_service(
     
     if result["reconnected"]:
         # Reconectado sin OAuth
+        await invalidate_connections_cache(current_user.id)
         return {"status": "reconnected", "message": result["message"]}
 
     
@@ -98,58 +176,30 @@ async def oauth_callback(
             user_id=user_id,
             db=db
         )
+        await invalidate_connections_cache(user_id)
 
         integration = oauth_conn.integration
         email = oauth_conn.meta_data.get("email", "")
 
-        # HTML de cierre
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head><title>Autenticación exitosa</title></head>
-        <body>
-            <h2>✅ Autenticación exitosa en {integration.capitalize()}</h2>
-            <p>Cerrando ventana...</p>
-            <script>
-                try {{
-                    if (window.opener) {{
-                        window.opener.postMessage({{
-                            status: 'success',
-                            app: '{integration}',
-                            email: '{email}'
-                        }}, '{FRONTEND_URL}');
-                    }}
-                }} catch(e) {{
-                    console.log('No se pudo enviar mensaje al opener:', e);
-                }} finally {{
-                    setTimeout(() => window.close(), 500);
-                }}
-            </script>
-        </body>
-        </html>
-        """
-        return HTMLResponse(content=html_content)
+        return Response(content=_render_callback_page(integration, email), media_type="text/html")
 
     except Exception as e:
-        return HTMLResponse(content=f"Error procesando OAuth: {str(e)}")
+        return HTMLResponse(content=f"Error procesando OAuth: {html.escape(str(e))}")
 
 
 @router.get("/connections", response_model=List[OAuthConnectionResponse])
 @limiter.limit("10/minute")
 async def get_connections(
     request:Request,
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ):
     """
     Obtiene todas las conexiones OAuth activas del usuario
     """
-    connections = db.query(OAuthConnection).filter_by(
-        user_id=current_user.id,
-        is_active=True
-    ).all()
-
-    return connections
+    # JSON directo (cacheado o de pydantic-core): sin re-validar con response_model
+    body = await _load_active_connections(current_user.id, db)
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/{integration}/status")
@@ -157,28 +207,26 @@ async def get_connections(
 async def service_status(
     request:Request,
     integration: str,
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ):
     """
     Verifica si un servicio está conectado
     """
-    oauth_conn = oauth_service.get_user_connection(
-        str(current_user.id),
-        integration,
-        db
+    oauth_conn = next(
+        (conn for conn in await _get_active_connections(current_user.id, db) if conn.service == integration),
+        None
     )
 
-
     if not oauth_conn:
-        return {"connected": False, "message": f"{integration.capitalize()} no conectado"}
+        return ORJSONResponse({"connected": False, "message": f"{integration.capitalize()} no conectado"})
 
-    return {
+    return ORJSONResponse({
         "connected": True,
         "email": oauth_conn.meta_data.get('email') if oauth_conn.meta_data else None,
         "connected_at": oauth_conn.connected_at,
         "last_used_at": oauth_conn.last_used_at
-    }
+    })
 
 
 @router.delete("/{integration}/disconnect")
@@ -186,7 +234,7 @@ async def service_status(
 async def disconnect_service(
     request:Request,
     integration: str,
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ):
     """
@@ -200,6 +248,7 @@ async def disconnect_service(
         integration,
         db
     )
+    await invalidate_connections_cache(current_user.id)
 
     if not result["success"]:
         raise HTTPException(
@@ -214,18 +263,18 @@ async def disconnect_service(
     elif result["remaining_services"] > 0:
         message += f". Aún tienes {result['remaining_services']} servicio(s) conectado(s)."
 
-    return {
+    return ORJSONResponse({
         "success": True,
         "message": message,
         "revoked_in_google": result["revoked"],
         "cleaned_database": result["cleaned"],
         "remaining_services": result["remaining_services"]
-    }
+    })
 
 #Endpoint para enviar token y permitir el uso de Google Picker y así poder acceder a Drive
 """@router.get("/drive/access-token")
 async def get_drive_access_token(
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
 ):
     try:
         #drive = DriveService()
@@ -3,23 +3,30 @@ payments.py
 Endpoints para gestionar pagos y suscripciones con Mercado Pago
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from apps.core.dependencies import get_db, get_current_user
-from apps.models.user import User
+from apps.core.dependencies import get_db, get_current_identity
+from apps.schemas.auth import UserIdentity
 from apps.services.payments.mercadopago_service import create_subscription_preference
 from apps.services.payments.subscription_service import (
     get_user_subscription,
-    get_user_usage
+    get_subscription_with_usage
 )
+from apps.middleware.subscription_middleware import get_subscription_summary
+from apps.schemas.subscription import SubscriptionSummaryOut
 from datetime import datetime
 
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
+_summary_adapter = TypeAdapter(SubscriptionSummaryOut)
+_UNKNOWN_SUMMARY = {"plan": "unknown", "status": "unknown", "usage": {}}
+
 
 @router.post("/create-checkout-session")
 def create_checkout(
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ):
     """
@@ -59,14 +66,13 @@ def create_checkout(
 
 @router.get("/subscription")
 def get_subscription_info(
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ):
     """
     Obtiene información de la suscripción del usuario
     """
-    subscription = get_user_subscription(current_user.id, db)
-    usage = get_user_usage(current_user.id, db)
+    subscription, usage = get_subscription_with_usage(current_user.id, db)
     
     if not subscription:
         raise HTTPException(status_code=404, detail="Subscription no encontrada")
@@ -95,12 +101,18 @@ def get_subscription_info(
 
 @router.get("/subscription/summary")
 def get_subscription_summary_endpoint(
-    current_user: User = Depends(get_current_user),
+    current_user: UserIdentity = Depends(get_current_identity),
     db: Session = Depends(get_db)
 ):
     """
     Obtiene resumen completo de suscripción y uso
     """
-    from apps.middleware.subscription_middleware import get_subscription_summary
+    summary = get_subscription_summary(current_user.id, db)
+    if summary is None:
+        return ORJSONResponse(_UNKNOWN_SUMMARY)
     
-    return get_subscription_summary(current_user.id, db)
\ No newline at end of file
+    # SubSummary (dataclass) -> JSON directo con pydantic-core, sin dicts intermedios
+    body = _summary_adapter.dump_json(
+        _summary_adapter.validate_python(summary, from_attributes=True)
+    )
+    return Response(content=body, media_type="application/json")
\ No newline at end of file
@@ -5,15 +5,17 @@ Reemplaza ws_chat.py — misma lógica, protocolo HTTP/SSE en lugar de WebSocket
 """
 
 import asyncio
-import json
+import logging
+import time
 import uuid
 from datetime import datetime, timezone
 from typing import Optional
 
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
 from apps.api.dependencies import get_user_from_token
@@ -24,30 +26,55 @@ from apps.middleware.subscription_middleware import (
     record_conversation_usage,
 )
 from apps.models.message import Message
-from apps.models.user import User
+from apps.schemas.auth import UserIdentity
 from apps.services.conversation.conversation_service import conversation_service
-from apps.services.memory.qdrant_service import search_context, store_message
+from apps.services.conversation.list_cache import invalidate_conversation_list
+from apps.services.memory.qdrant_service import search_context, store_messages
 from apps.services.orchestrator.orchestrator_service import orchestrator
 from apps.services.orchestrator.time_spent_specific import timer
 from apps.redis_client import redis
 
 router  = APIRouter()
+logger  = logging.getLogger(__name__)
 bearer  = HTTPBearer()
 
 # ── Almacén temporal de requests pendientes ───────────────────────────────────
 # Vida útil: desde POST /send hasta GET /stream/{id} (segundos).
-# El payload se elimina con pop() al abrir el stream → sin acumulación.
-# Con un solo worker esto es suficiente; para multi-worker usar Redis.
+# Viven en Redis (req:{request_id}, TTL 30 s) → compartido entre workers.
+# Al abrir el stream se leen y borran con un solo GETDEL: una clave plana,
+# un round-trip, y un mismo request_id no puede abrir dos streams.
+PENDING_REQUEST_TTL = 30
 
-# Tiempo máximo (segundos) que un request_id permanece en el dict sin que
-# el cliente abra el stream. Pasado este tiempo se descarta automáticamente.
+# Sin eventos durante este tiempo se envía un comentario keep-alive
+SSE_HEARTBEAT_SECONDS = 5
+
+
+def _pending_request_key(request_id: str) -> str:
+    return f"req:{request_id}"
+
+
+# Tareas en background (fire-and-forget): el loop solo guarda referencias
+# débiles, así que se retienen aquí hasta que terminan
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _spawn_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
 
 
 
 # ── Schemas ───────────────────────────────────────────────────────────────────
 
+# Tope del mensaje: un payload enorme bloquearía el loop al (de)serializarlo
+# y acabaría entero en el prompt, el embedding y Redis.
+MAX_MESSAGE_CHARS = 64_000
+
+
 class SendMessageRequest(BaseModel):
-    message:         str
+    message:         str = Field(..., max_length=MAX_MESSAGE_CHARS)
     session_id:      str
     conversation_id: Optional[str] = None
 
@@ -77,7 +104,9 @@ def check_limit_safe(user_id):
         db.close()
 
 def init_conversation_safe(user_id, conversation_id, message_content):
-    db = SessionLocal()
+    # expire_on_commit=False: tras los dos commits, id / title / created_at
+    # se leen de memoria (los valores los fijó Python) en vez de re-SELECT
+    db = SessionLocal(expire_on_commit=False)
     try:
         conversation = conversation_service.get_or_create_active_conversation(
             user_id=user_id,
@@ -97,7 +126,11 @@ def init_conversation_safe(user_id, conversation_id, message_content):
     finally:
         db.close()
 
-def save_assistant_message_safe(conversation_id, content, metadata):
+def finalize_turn_safe(conversation_id, content, metadata, user_id):
+    """
+    Cierre del turno en una sola sesión: guarda la respuesta del agente y
+    registra el uso (antes eran dos sesiones/conexiones en paralelo).
+    """
     db = SessionLocal()
     try:
         conversation_service.save_assistant_message(
@@ -106,46 +139,70 @@ def save_assistant_message_safe(conversation_id, content, metadata):
             metadata=metadata,
             db=db,
         )
-    finally:
-        db.close()
-
-def record_usage_safe(user_id):
-    db = SessionLocal()
-    try:
         record_conversation_usage(user_id, db)
     finally:
         db.close()
 
 # ── Helpers SSE ───────────────────────────────────────────────────────────────
 
-def _sse_event(event_type: str, data: dict) -> str:
+def _sse_event(event_type: str, data: dict) -> bytes:
     """Formatea un evento SSE estándar con serialización segura."""
-    payload = json.dumps(data, ensure_ascii=False, default=str)
-    return f"event: {event_type}\ndata: {payload}\n\n"
+    # orjson serializa UUID/datetime de forma nativa; default=str cubre el resto.
+    # Se arma directamente en bytes: StreamingResponse los envía tal cual,
+    # sin el ida y vuelta str → bytes por cada chunk.
+    payload = orjson.dumps(data, default=str)
+    return b"".join((b"event: ", event_type.encode(), b"\ndata: ", payload, b"\n\n"))
+
+
+# (ms, iso) del último timestamp formateado: los eventos emitidos dentro del
+# mismo milisegundo reutilizan el string en vez de crear un datetime cada uno.
+_ts_cache = (0, "")
+
+
+def _event_timestamp() -> str:
+    """Timestamp ISO-8601 UTC con precisión de milisegundos (cacheado por ms)."""
+    global _ts_cache
+    now_ms = time.time_ns() // 1_000_000
+    cached_ms, cached_iso = _ts_cache
+    if now_ms != cached_ms:
+        cached_iso = datetime.fromtimestamp(now_ms / 1000, timezone.utc).isoformat(timespec="milliseconds")
+        _ts_cache = (now_ms, cached_iso)
+    return cached_iso
 
 
-def _sse_comment(text: str = "") -> str:
+def _sse_comment(text: str = "") -> bytes:
     """Heartbeat / keep-alive — mantiene la conexión viva en Cloud Run."""
-    return f": {text}\n\n"
+    return b": " + text.encode() + b"\n\n"
 
 
 # ── Background tasks ──────────────────────────────────────────────────────────
 
-async def _update_title_background(conversation_id, first_message: str, user_id):
+async def _update_title_background(
+    conversation_id,
+    first_message: str,
+    user_id,
+    title_gen: Optional[asyncio.Task] = None,
+):
     """
     Genera y guarda el título de la conversación en segundo plano.
     Usa su propia sesión de DB para no interferir con el flujo principal.
+    Si `title_gen` ya está en curso (conversación nueva), reutiliza su
+    resultado en vez de volver a llamar al LLM.
+    Retorna el título generado (o None) para evitar re-consultarlo.
     """
     db = SessionLocal()
     try:
-        await conversation_service.update_conversation_title(
+        title = await title_gen if title_gen is not None else None
+        return await conversation_service.update_conversation_title(
             conversation_id=conversation_id,
             first_message=first_message,
             user_id=user_id,
             db=db,
+            title=title,
         )
     except Exception as e:
-        print(f"⚠️ Error actualizando título (background): {e}")
+        logger.warning("⚠️ Error actualizando título (background): %s", e)
+        return None
     finally:
         db.close()
 
@@ -161,23 +218,24 @@ async def _index_messages_background(
     El evento 'completed' llega al frontend sin esperar las escrituras vectoriales.
     """
     try:
-        store_message(user_message, metadata={
-            "role": "user",
-            "conversation_id": conversation_id,
-            "user_id": user_id,
-        })
-        store_message(result_text, metadata={
-            "role": "assistant",
-            "conversation_id": conversation_id,
-            "user_id": user_id,
-        })
+        # store_messages es bloqueante (embedding + upsert): va a un hilo
+        # para no congelar el event loop mientras otros streams emiten.
+        # Ambos mensajes del turno comparten un embedding y un upsert.
+        await asyncio.to_thread(
+            store_messages,
+            [user_message, result_text],
+            [
+                {"role": "user", "conversation_id": conversation_id, "user_id": user_id},
+                {"role": "assistant", "conversation_id": conversation_id, "user_id": user_id},
+            ],
+        )
     except Exception as e:
-        print(f"⚠️ Error indexando mensajes en Qdrant (background): {e}")
+        logger.warning("⚠️ Error indexando mensajes en Qdrant (background): %s", e)
 
 
 # ── Helpers de autenticación ──────────────────────────────────────────────────
 
-async def _authenticate(credentials: HTTPAuthorizationCredentials) -> User:
+async def _authenticate(credentials: HTTPAuthorizationCredentials) -> UserIdentity:
     """
     Autentica al usuario a partir del Bearer token del header Authorization.
     Abre y cierra su propia sesión de DB (el scope no se comparte con el
@@ -230,12 +288,12 @@ async def send_message(
 
     try:
         await redis.setex(
-            f"req:{request_id}",
-            30,  # TTL
-            json.dumps(payload)
+            _pending_request_key(request_id),
+            PENDING_REQUEST_TTL,
+            orjson.dumps(payload)
         )
     except Exception as e:
-        print(f"❌ Redis error: {e}")
+        logger.error("❌ Redis error: %s", e)
         raise HTTPException(
             status_code=500,
             detail="Error temporal, intenta de nuevo"
@@ -250,11 +308,16 @@ async def send_message(
 # ── Endpoint 2: GET /agent/stream/{request_id} ────────────────────────────────
 
 @router.get("/agent/stream/{request_id}")
-async def sse_stream(request_id: str, request: Request):
+async def sse_stream(request_id: str, request: Request, compact: bool = False):
     """
     Abre el stream SSE para un request_id previamente registrado via POST /send.
     La URL no contiene token ni mensaje — solo el ID de la operación.
 
+    Con ?compact=true los eventos de progreso del orquestador se agrupan en un
+    único evento `batch` por escritura: session_id y ts (epoch ms) van una vez
+    en el sobre y cada evento lleva solo {"t": tipo, "d": datos}.
+    warning / completed / error conservan el formato normal.
+
     Eventos emitidos:
         analyzing   → clasificando intent
         loading     → cargando herramientas
@@ -263,13 +326,18 @@ async def sse_stream(request_id: str, request: Request):
         planning    → planificando pasos
         executing   → ejecutando tool
         processing  → procesando resultado de tool
+        token       → fragmento de la respuesta en streaming ({"text": ...});
+                      los fragmentos nunca se descartan: si el cliente va
+                      lento se agrupan en un solo evento
         saving      → guardando resultados
         warning     → advertencia no fatal
-        completed   → operación completada (cierra stream)
+        completed   → operación completada (cierra stream); su "message" trae
+                      el texto completo y es la versión definitiva
         error       → error en algún paso (cierra stream)
     """
 
-    raw = await redis.get(f"req:{request_id}")
+    # Leer y eliminar en la misma operación (importante)
+    raw = await redis.getdel(_pending_request_key(request_id))
 
     if raw is None:
         async def _not_found():
@@ -279,50 +347,83 @@ async def sse_stream(request_id: str, request: Request):
             })
         return StreamingResponse(_not_found(), media_type="text/event-stream")
 
-    payload = json.loads(raw)
-
-    # eliminar después de leer (importante)
-    await redis.delete(f"req:{request_id}")
+    payload = orjson.loads(raw)
 
     # Extraer datos del payload
     message         = payload["message"]
     session_id      = payload["session_id"]
     conversation_id = payload["conversation_id"]
     
-    user_id = payload["user_id"]
-
-    db = SessionLocal()
-    try:
-        current_user = db.query(User).get(user_id)
-    finally:
-        db.close()
+    # El usuario ya fue autenticado en POST /agent/send; solo se necesita su ID
+    user_id = uuid.UUID(payload["user_id"])
 
     # ── Generador principal ───────────────────────────────────────────────────
     async def event_generator():
 
         # Cola interna: event_callback encola, el generador desencola y emite
         queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        # Despierta al generador en cuanto hay eventos (sin sondear la cola)
+        events_ready = asyncio.Event()
+        # Texto en streaming pendiente de enviar: no pasa por la cola acotada
+        # (solo el progreso es descartable), drain_queue lo vacía como un token
+        pending_text: list[str] = []
 
         async def event_callback(event_type: str, event_data: dict):
-            try:
-                queue.put_nowait((event_type, event_data))
-            except asyncio.QueueFull:
-                pass
-
             if isinstance(event_data, dict):
                 # Filtrar objetos no serializables que el orquestador pueda colar
                 for key in ("mcp_clients", "client", "mcp_client"):
                     event_data.pop(key, None)
-            await queue.put((event_type, event_data))
+            if event_type == "token":
+                pending_text.append(event_data.get("text", ""))
+                events_ready.set()
+                return
+            try:
+                queue.put_nowait((event_type, event_data))
+            except asyncio.QueueFull:
+                # Cliente lento: se pierde un evento de progreso, el
+                # orquestador nunca espera por la red
+                pass
+            events_ready.set()
 
         async def drain_queue():
-            while not queue.empty():
-                evt_type, evt_data = await queue.get()
-                yield _sse_event(evt_type, {
+            # Todos los eventos pendientes salen en un solo chunk (una
+            # escritura / un segmento TCP); siguen siendo eventos SSE
+            # independientes para el cliente.
+            batch = []
+            if pending_text:
+                text = "".join(pending_text)
+                pending_text.clear()
+                if compact:
+                    batch.append({"t": "token", "d": {"text": text}})
+                else:
+                    batch.append(_sse_event("token", {
+                        "session_id": session_id,
+                        "timestamp":  _event_timestamp(),
+                        "text":       text,
+                    }))
+            while True:
+                try:
+                    evt_type, evt_data = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if compact:
+                    batch.append({"t": evt_type, "d": evt_data})
+                else:
+                    batch.append(_sse_event(evt_type, {
+                        "session_id": session_id,
+                        "timestamp":  _event_timestamp(),
+                        **evt_data,
+                    }))
+            if not batch:
+                return
+            if compact:
+                yield _sse_event("batch", {
                     "session_id": session_id,
-                    "timestamp":  datetime.now(timezone.utc).isoformat(),
-                    **evt_data,
+                    "ts":         time.time_ns() // 1_000_000,
+                    "events":     batch,
                 })
+            else:
+                yield b"".join(batch)
 
         # Keep-alive inicial (Cloud Run necesita datos rápido para no cerrar)
         yield _sse_comment("connected")
@@ -333,13 +434,21 @@ async def sse_stream(request_id: str, request: Request):
             "message": "Validando sesión...",
         })
 
+        # Conversación nueva → el título siempre hará falta: la llamada al
+        # LLM arranca ya, en paralelo con límites, init y contexto.
+        title_gen_task = None
+        if not conversation_id:
+            title_gen_task = asyncio.create_task(
+                conversation_service.generate_smart_title(message, user_id)
+            )
+
         try:
-            # ── Ejecución Paralela: Límites e Inicialización ──
+            # ── Ejecución Paralela: Límites, Inicialización y Título ──
             limit_task = asyncio.create_task(
-                asyncio.to_thread(check_limit_safe, current_user.id)
+                asyncio.to_thread(check_limit_safe, user_id)
             )
             conv_task = asyncio.create_task(
-                asyncio.to_thread(init_conversation_safe, current_user.id, conversation_id, message)
+                asyncio.to_thread(init_conversation_safe, user_id, conversation_id, message)
             )
 
             # ── Contexto e Historial Paralelo ──
@@ -348,7 +457,7 @@ async def sse_stream(request_id: str, request: Request):
                     asyncio.to_thread(
                         search_context,
                         query=message,
-                        user_id=str(current_user.id),
+                        user_id=str(user_id),
                         conversation_id=str(conversation_id),
                         limit=10,
                         score_threshold=0.5,
@@ -372,7 +481,7 @@ async def sse_stream(request_id: str, request: Request):
                 conversation_history = []
 
             # ── Límites de suscripción (Warning) ──
-            remaining = limit_check.get("conversations_remaining")
+            remaining = limit_check.conversations_remaining
             if remaining is not None and remaining <= 3:
                 yield _sse_event("warning", {
                     "session_id":  session_id,
@@ -390,43 +499,56 @@ async def sse_stream(request_id: str, request: Request):
                     _update_title_background(
                         conversation_id=actual_conversation_id,
                         first_message=message,
-                        user_id=current_user.id,
+                        user_id=user_id,
+                        title_gen=title_gen_task,
                     )
                 )
 
             context_text = "\n".join(context_list) if context_list else ""
-            print(f"🔍 Contexto recuperado: {len(context_list)} mensajes")
+            logger.info("🔍 Contexto recuperado: %d mensajes", len(context_list))
 
             # ── Orquestador en background + streaming de eventos ──────────
             orchestrator_task = asyncio.create_task(
                 orchestrator(
                     user_input=message,
-                    user_id=str(current_user.id),
+                    user_id=str(user_id),
                     context=context_text,
                     event_callback=event_callback,
                     conversation_history=conversation_history,
                 )
             )
 
-            # Emitir eventos mientras el orquestador trabaja
+            # Emitir eventos mientras el orquestador trabaja: se despierta con
+            # cada evento o al terminar; el heartbeat solo sale si no hubo nada
             while not orchestrator_task.done():
                 if await request.is_disconnected():
                     orchestrator_task.cancel()
-                    print(f"⚠️ Cliente desconectó: user={current_user.id} session={session_id}")
+                    logger.info("⚠️ Cliente desconectó: user=%s session=%s", user_id, session_id)
                     return
 
-                async for chunk in drain_queue():
-                    yield chunk
+                ready_waiter = asyncio.create_task(events_ready.wait())
+                try:
+                    await asyncio.wait(
+                        {ready_waiter, orchestrator_task},
+                        timeout=SSE_HEARTBEAT_SECONDS,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                finally:
+                    ready_waiter.cancel()
 
-                yield _sse_comment("heartbeat")
-                await asyncio.sleep(0.1)
+                if events_ready.is_set():
+                    events_ready.clear()
+                    async for chunk in drain_queue():
+                        yield chunk
+                elif not orchestrator_task.done():
+                    yield _sse_comment("heartbeat")
 
             # Vaciar cola final tras completar
             async for chunk in drain_queue():
                 yield chunk
 
             result = await orchestrator_task
-            print(f"📊 Resultado orquestador: {result}")
+            logger.debug("📊 Resultado orquestador: %s", result)
 
             # ── Extraer respuesta ─────────────────────────────────────────
             result_text     = (
@@ -438,38 +560,31 @@ async def sse_stream(request_id: str, request: Request):
             )
 
             # ── Guardar respuesta del agente ──────────────────────────────
-            await asyncio.gather(
-                asyncio.to_thread(
-                    save_assistant_message_safe,
-                    actual_conversation_id,
-                    result_text,
-                    result_metadata,
-                ),
-                asyncio.to_thread(
-                    record_usage_safe,
-                    current_user.id,
-                )
+            await asyncio.to_thread(
+                finalize_turn_safe,
+                actual_conversation_id,
+                result_text,
+                result_metadata,
+                user_id,
             )
 
             # ── Indexar en Qdrant en background ───────────────────────────
-            asyncio.create_task(
+            _spawn_background(
                 _index_messages_background(
                     user_message=message,
                     result_text=result_text,
                     conversation_id=str(actual_conversation_id),
-                    user_id=str(current_user.id),
+                    user_id=str(user_id),
                 )
             )
             # ── Esperar título si se estaba generando ──
             if title_task is not None:
-                await title_task
-                db = SessionLocal()
-                try:
-                    from apps.models.conversation import Conversation
-                    conv = db.query(Conversation).get(actual_conversation_id)
-                    conversation_title = conv.title if conv else conversation_title
-                finally:
-                    db.close()
+                new_title = await title_task
+                if new_title:
+                    conversation_title = new_title
+
+            # Nuevo mensaje / título → el listado cacheado ya no vale
+            await invalidate_conversation_list(user_id)
 
             # ── Evento final ──────────────────────────────────────────────
             yield _sse_event("completed", {
@@ -491,13 +606,19 @@ async def sse_stream(request_id: str, request: Request):
             })
 
         except Exception as e:
-            print(f"❌ Error en stream SSE: {e}")
+            logger.error("❌ Error en stream SSE: %s", e)
             yield _sse_event("error", {
                 "session_id": session_id,
                 "message":    f"Error procesando tu mensaje: {str(e)}",
                 "error_type": type(e).__name__,
             })
 
+        finally:
+            # Límite alcanzado / error / cliente desconectado: no dejar
+            # la llamada de título huérfana (no-op si ya terminó)
+            if title_gen_task is not None:
+                title_gen_task.cancel()
+
     return StreamingResponse(
         event_generator(),
         media_type="text/event-stream",
@@ -4,10 +4,21 @@ from sqlalchemy.orm import Session
 from apps.database import SessionLocal
 from apps.core.security import decode_token,create_access_token
 from apps.models.user import User
+from apps.schemas.auth import UserIdentity
+from apps.redis_client import redis
 from datetime import timedelta
+from typing import Optional
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+# Tope de vida de la identidad cacheada (además de la expiración del token)
+USER_CACHE_TTL = 300
+
 
 def get_db():
     """Dependency para obtener sesión de BD"""
@@ -18,6 +29,54 @@ def get_db():
         db.close()
 
 
+def _user_cache_key(user_id) -> str:
+    return f"auth:user:{user_id}"
+
+
+async def invalidate_user_cache(user_id) -> None:
+    """Elimina la identidad cacheada (logout, borrado de cuenta...)"""
+    try:
+        await redis.delete(_user_cache_key(user_id))
+    except Exception as e:
+        logger.warning("⚠️ Error invalidando cache de usuario: %s", e)
+
+
+async def load_user_identity(payload: dict, db: Session) -> Optional[UserIdentity]:
+    """
+    Resuelve la identidad del usuario a partir de un payload JWT ya validado.
+    Primero consulta Redis; si no está, va a la BD y la cachea con
+    TTL = min(exp del token - ahora, USER_CACHE_TTL).
+
+    Returns:
+        UserIdentity, o None si el usuario no existe
+    """
+    key = _user_cache_key(payload["sub"])
+
+    try:
+        cached = await redis.get(key)
+        if cached:
+            return UserIdentity.model_validate_json(cached)
+    except Exception as e:
+        logger.warning("⚠️ Redis no disponible para cache de usuario: %s", e)
+
+    user = db.query(User).filter(User.id == payload["sub"]).first()
+
+    if user is None:
+        return None
+
+    identity = UserIdentity.model_validate(user)
+
+    ttl = min(int(payload.get("exp", 0) - time.time()), USER_CACHE_TTL)
+    if ttl > 0:
+        try:
+            # NX: si otra petición concurrente ya la guardó, no se pisa
+            await redis.set(key, identity.model_dump_json(), nx=True, ex=ttl)
+        except Exception as e:
+            logger.warning("⚠️ Error cacheando usuario: %s", e)
+
+    return identity
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -57,6 +116,51 @@ async def get_current_user(
     return user
 
 
+async def get_current_identity(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> UserIdentity:
+    """
+    Dependency para endpoints que solo necesitan id/email del usuario.
+    Igual que get_current_user pero servida desde Redis (sin SELECT por
+    petición); no retorna el modelo ORM, así que no sirve para modificarlo.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="No se pudo validar las credenciales",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    payload = decode_token(credentials.credentials)
+
+    if payload is None or payload.get("sub") is None or payload.get("type") != "access":
+        raise credentials_exception
+
+    identity = await load_user_identity(payload, db)
+
+    if identity is None:
+        raise credentials_exception
+
+    if not identity.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Usuario inactivo"
+        )
+
+    return identity
+
+
+async def get_current_user_id(
+    identity: UserIdentity = Depends(get_current_identity),
+) -> uuid.UUID:
+    """
+    Dependency ligera: retorna solo el ID del usuario. Pasa por la identidad
+    cacheada en Redis (sin SELECT con hit), así que mantiene los chequeos de
+    usuario existente (401) y activo (403) de get_current_user.
+    """
+    return identity.id
+
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
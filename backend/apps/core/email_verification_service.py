@@ -1,9 +1,10 @@
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from fastapi import HTTPException, status
 from apps.models.email_verification import EmailVerification
 from apps.core.security import generate_otp
-from apps.core.security import hash_code
+from apps.core.security import hash_otp, verify_otp
 from apps.models.user import User
 
 VERIFICATION_EXP_MINUTES = 10
@@ -15,14 +16,14 @@ def create_email_verification(user_id, db: Session) -> str:
     db.query(EmailVerification).filter(
         EmailVerification.user_id == user_id,
         EmailVerification.used == False
-    ).update({ "used": True })
+    ).update({ "used": True }, synchronize_session=False)
 
     # 🔢 generar código
     code = generate_otp()
 
     record = EmailVerification(
         user_id=user_id,
-        code_hash=hash_code(code),
+        code_hash=hash_otp(code),
         expires_at=datetime.utcnow() + timedelta(minutes=VERIFICATION_EXP_MINUTES),
         attempts=0,
         used=False
@@ -35,7 +36,7 @@ def create_email_verification(user_id, db: Session) -> str:
 
 
 def verify_email_code(email: str, code: str, db: Session):
-    user = db.query(User).filter(User.email == email).first()
+    user = db.query(User).filter(func.lower(User.email) == email.lower()).first()
 
     if not user:
         raise HTTPException(
@@ -74,7 +75,7 @@ def verify_email_code(email: str, code: str, db: Session):
 
     verification.attempts += 1
 
-    if verification.code_hash != hash_code(code):
+    if not verify_otp(code, verification.code_hash):
         db.commit()
         raise HTTPException(
             status_code=400,
@@ -1,29 +1,93 @@
+import base64
+import os
 from cryptography.fernet import Fernet, MultiFernet, InvalidToken
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from config import ENCRYPTION_KEY
 
+# Prefijo de los tokens cifrados con AES-GCM. Los tokens Fernet antiguos
+# (empiezan con 'gAAAAA') se siguen leyendo hasta que se re-cifren.
+AEAD_PREFIX = "v2:"
+FERNET_PREFIX = "gAAAAA"
+NONCE_SIZE = 12
+
+# Longitudes mínimas de un token cifrado con contenido: evita tomar por
+# cifrado un texto plano corto que casualmente empiece con el prefijo.
+# AES-GCM: prefijo + base64(nonce 12 + tag 16 + >=1 byte)
+# Fernet: base64(versión 1 + ts 8 + IV 16 + bloque 16 + HMAC 32)
+_MIN_AEAD_LEN = len(AEAD_PREFIX) + 40
+_MIN_FERNET_LEN = 100
+
+
+def _derive_aead_key(fernet_key: bytes) -> bytes:
+    """Deriva una clave AES-256 independiente a partir de la clave Fernet."""
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"assistwork-oauth-token-aesgcm",
+    ).derive(base64.urlsafe_b64decode(fernet_key))
+
+
 class TokenEncryption:
     def __init__(self):
         key = ENCRYPTION_KEY
         if not key:
             raise ValueError("ENCRYPTION_KEY no está configurada en .env")
 
-        # Si solo hay una clave:
-        self.cipher = Fernet(key.encode())
-    
+        # Rotación: ENCRYPTION_KEY admite varias claves separadas por coma.
+        # La primera cifra; todas sirven para descifrar.
+        keys = [k.strip().encode() for k in key.split(",") if k.strip()]
+
+        # Fernet solo se usa para leer tokens antiguos
+        self.cipher = MultiFernet([Fernet(k) for k in keys])
+
+        # AES-GCM (AES-NI + PCLMULQDQ vía OpenSSL): sin la pasada HMAC de Fernet
+        self._aeads = [AESGCM(_derive_aead_key(k)) for k in keys]
+        self._encrypt_aead = self._aeads[0].encrypt
+
+    def is_encrypted(self, value: str) -> bool:
+        """
+        Indica si el valor ya tiene formato de token cifrado (AES-GCM o Fernet).
+        Solo mira prefijo y longitud mínima: nunca intenta descifrar.
+        """
+        if value.startswith(AEAD_PREFIX):
+            return len(value) >= _MIN_AEAD_LEN
+        return value.startswith(FERNET_PREFIX) and len(value) >= _MIN_FERNET_LEN
+
     def encrypt(self, token: str) -> str:
         """Encripta un token"""
         if not token:
             raise ValueError("Token no puede estar vacío")
-        return self.cipher.encrypt(token.encode()).decode()
-    
-    
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = self._encrypt_aead(nonce, token.encode(), None)
+        return AEAD_PREFIX + base64.urlsafe_b64encode(nonce + ciphertext).decode()
+
     def decrypt(self, encrypted_token: str) -> str:
         if not encrypted_token:
             raise ValueError("Token encriptado no puede estar vacío")
+
+        if not encrypted_token.startswith(AEAD_PREFIX):
+            # Formato Fernet (tokens guardados antes de AES-GCM)
+            try:
+                return self.cipher.decrypt(encrypted_token.encode()).decode()
+            except InvalidToken:
+                raise ValueError("El token no es válido o la clave de cifrado es incorrecta.")
+
         try:
-            return self.cipher.decrypt(encrypted_token.encode()).decode()
-        except InvalidToken:
+            raw = base64.urlsafe_b64decode(encrypted_token[len(AEAD_PREFIX):])
+        except (ValueError, TypeError):
             raise ValueError("El token no es válido o la clave de cifrado es incorrecta.")
 
+        nonce, ciphertext = raw[:NONCE_SIZE], raw[NONCE_SIZE:]
+        for aead in self._aeads:
+            try:
+                return aead.decrypt(nonce, ciphertext, None).decode()
+            except InvalidTag:
+                continue
+        raise ValueError("El token no es válido o la clave de cifrado es incorrecta.")
+
 # Singleton
-encryption = TokenEncryption()
\ No newline at end of file
+encryption = TokenEncryption()
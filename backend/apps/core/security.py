@@ -1,10 +1,18 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from jose import JWTError, jwk, jwt
+import asyncio
+import bcrypt
+from argon2 import PasswordHasher, Type as Argon2Type
+from argon2.exceptions import InvalidHashError, VerificationError, VerifyMismatchError
 import secrets
 import hashlib
-from config import JWT_SECRET_KEY, JWT_ALGORITHM, JWT_ACCESS_TOKEN_EXPIRE_MINUTES, JWT_REFRESH_TOKEN_EXPIRE_DAYS
+import hmac
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
+from config import JWT_SECRET_KEY, JWT_ALGORITHM, JWT_ACCESS_TOKEN_EXPIRE_MINUTES, JWT_REFRESH_TOKEN_EXPIRE_DAYS, ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM
 import os
 from dotenv import load_dotenv
 
@@ -17,58 +25,153 @@ ALGORITHM = JWT_ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES =int (JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
 REFRESH_TOKEN_EXPIRE_DAYS = int (JWT_REFRESH_TOKEN_EXPIRE_DAYS)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing: Argon2id (argon2-cffi). Los hashes bcrypt antiguos
+# ($2a$/$2b$, generados por passlib o bcrypt) se siguen verificando y se
+# re-hashean a Argon2id en el siguiente login correcto.
+_password_hasher = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=ARGON2_PARALLELISM,
+    type=Argon2Type.ID,
+)
+_BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica una contraseña"""
-    return pwd_context.verify(plain_password, hashed_password)
+    if hashed_password.startswith(_BCRYPT_PREFIXES):
+        try:
+            return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+        except ValueError:
+            # Hash con formato inválido
+            return False
+    try:
+        return _password_hasher.verify(hashed_password, plain_password)
+    except (VerifyMismatchError, VerificationError, InvalidHashError):
+        return False
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True si el hash es bcrypt o Argon2id con parámetros distintos a los actuales"""
+    if hashed_password.startswith(_BCRYPT_PREFIXES):
+        return True
+    try:
+        return _password_hasher.check_needs_rehash(hashed_password)
+    except InvalidHashError:
+        return True
 
 
 def get_password_hash(password: str) -> str:
     """Hashea una contraseña"""
-    return pwd_context.hash(password)
+    return _password_hasher.hash(password)
+
+
+# Pool propio para el hashing de contraseñas: argon2-cffi y bcrypt liberan el
+# GIL, así que hilos bastan, pero separados del executor por defecto de
+# asyncio.to_thread (sesiones de DB del chat, Qdrant...) para que una ráfaga
+# de logins no los deje sin hilos.
+_password_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="password-hash")
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password fuera del event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_pool, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash fuera del event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_pool, get_password_hash, password)
+
+
+# Constantes precalculadas al importar: cada token solo añade sub/exp/type
+_ACCESS_TOKEN_DELTA = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+_REFRESH_TOKEN_DELTA = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+_JWT_HEADERS = {"typ": "JWT"}
+
+# Clave JOSE construida una vez: con la clave como str, python-jose la
+# re-construye al firmar y al verificar intenta parsearla como JSON (JWK)
+# antes de usarla, en cada llamada
+_JWT_KEY = jwk.construct(SECRET_KEY, ALGORITHM)
+_JWT_ALGORITHMS = [ALGORITHM]
+
+
+def _encode_token(data: dict, token_type: str, expires_delta: timedelta) -> str:
+    """Firma un JWT con las claims dadas más exp y type"""
+    # exp directo en segundos epoch (lo que jose haría con el datetime),
+    # sin crear un datetime por token
+    exp = int(time.time() + expires_delta.total_seconds())
+    to_encode = {**data, "exp": exp, "type": token_type}
+    return jwt.encode(to_encode, _JWT_KEY, algorithm=ALGORITHM, headers=_JWT_HEADERS)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Crea un JWT access token"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return _encode_token(data, "access", expires_delta or _ACCESS_TOKEN_DELTA)
 
 
 def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Crea un JWT refresh token"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    
-    to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return _encode_token(data, "refresh", expires_delta or _REFRESH_TOKEN_DELTA)
+
+
+# Caché de tokens ya verificados: una SPA repite el mismo access token en
+# ráfagas de requests. Solo se cachean tokens válidos y cada entrada vive
+# como máximo DECODE_CACHE_TTL segundos o hasta su `exp`, lo que ocurra antes.
+DECODE_CACHE_TTL = 60
+_decode_cache = TTLCache(maxsize=10_000, ttl=DECODE_CACHE_TTL)
+_decode_cache_lock = threading.Lock()
 
 
 def decode_token(token: str) -> dict:
     """Decodifica y valida un JWT token"""
+    if not token:
+        return None
+
+    with _decode_cache_lock:
+        payload = _decode_cache.get(token)
+    if payload is not None:
+        if payload["exp"] > time.time():
+            return payload
+        with _decode_cache_lock:
+            _decode_cache.pop(token, None)
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        payload = jwt.decode(token, _JWT_KEY, algorithms=_JWT_ALGORITHMS)
     except JWTError:
         return None
+
+    if isinstance(payload.get("exp"), (int, float)):
+        with _decode_cache_lock:
+            _decode_cache[token] = payload
+    return payload
     
 
 def generate_otp(length: int = 6) -> str:
-    return "".join(str(secrets.randbelow(10)) for _ in range(length))
+    # Un solo sorteo uniforme en [0, 10^length) con ceros a la izquierda:
+    # misma distribución que dígito a dígito, una lectura de urandom
+    return f"{secrets.randbelow(10 ** length):0{length}d}"
+
+
+_sha256 = hashlib.sha256
 
 
 def hash_code(code: str) -> str:
-    return hashlib.sha256(code.encode()).hexdigest()
+    return _sha256(code.encode()).hexdigest()
+
+
+# Pepper para los OTP: sin él, un hash SHA-256 de 6 dígitos se revierte
+# probando el millón de combinaciones. BLAKE2b con clave es un MAC en una
+# sola pasada; no hace falta estirar (KDF) porque el código expira en
+# minutos y los intentos están limitados.
+_OTP_PEPPER = hashlib.sha256(SECRET_KEY.encode()).digest()
+
+
+def hash_otp(code: str) -> str:
+    return hashlib.blake2b(code.encode(), key=_OTP_PEPPER, digest_size=16).hexdigest()
+
+
+def verify_otp(code: str, code_hash: str) -> bool:
+    """Compara el OTP con su hash en tiempo constante."""
+    return hmac.compare_digest(hash_otp(code), code_hash)
@@ -2,22 +2,38 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
-from config import DATABASE_URL
+import orjson
+from config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_DISABLE_JIT
 
 
 
+def _json_serializer(value) -> str:
+    # JSON/JSONB (meta_data, context, ...) con orjson; OPT_NON_STR_KEYS
+    # conserva el comportamiento de json.dumps con claves int
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+_connect_args = {
+    "sslmode": "require",  # SSL obligatorio en Supabase
+    "connect_timeout": 10,
+    "application_name": "assistwork",  # Identifica las conexiones en pg_stat_activity
+}
+if DB_DISABLE_JIT:
+    _connect_args["options"] = "-c jit=off"
+
 # Engine con configuración para Supabase
 engine = create_engine(
     DATABASE_URL,
-    pool_size=5,              # Supabase free tier: max 60 conexiones totales
-    max_overflow=10,
+    pool_size=DB_POOL_SIZE,          # Ajustable por env; con varios workers usar el pooler de Supabase
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=10,                 # Fallar rápido en vez de colgar la petición esperando conexión
     pool_pre_ping=True,       # Verifica conexión antes de usar
-    pool_recycle=3600,         # Recicla cada 5 minutos (Supabase cierra inactivas)
+    pool_recycle=DB_POOL_RECYCLE,    # 5 minutos por defecto (Supabase cierra inactivas)
+    pool_use_lifo=True,              # Reusa las conexiones más recientes; las sobrantes envejecen y se reciclan
     echo=False,
-    connect_args={
-        "sslmode": "require",  # SSL obligatorio en Supabase
-        "connect_timeout": 10
-    }
+    connect_args=_connect_args,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -5,16 +5,20 @@ Middleware para verificar límites de suscripción antes de procesar acciones
 
 from sqlalchemy.orm import Session
 from apps.services.payments.subscription_service import (
-    get_user_subscription,
-    get_user_usage,
+    get_subscription_snapshot,
     check_trial_expired,
     increment_conversation_count,
     increment_file_count
 )
 from apps.models.subscription import SubscriptionStatus
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Optional
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 
 class SubscriptionLimitError(Exception):
     """Excepción cuando se alcanza un límite de suscripción"""
@@ -24,7 +28,46 @@ class SubscriptionLimitError(Exception):
         super().__init__(self.message)
 
 
-def check_conversation_limit(user_id: uuid.UUID, db: Session) -> dict:
+@dataclass(slots=True)
+class LimitResult:
+    """Resultado de check_conversation_limit (plano, sin dicts anidados)"""
+    allowed: bool
+    message: str
+    upgrade_required: bool
+    conversations_count: int
+    conversations_limit: Optional[int]
+    conversations_remaining: Optional[int]
+    files_count: int
+    files_limit: int
+
+
+@dataclass(slots=True)
+class SubSummary:
+    """Resumen de suscripción y uso; se serializa con SubscriptionSummaryOut"""
+    plan: str
+    status: str
+    trial_active: bool
+    trial_expired: bool
+    days_left: Optional[int]
+    current_period_end: Optional[datetime]
+    cancel_at_period_end: bool
+    conversations_count: int
+    conversations_limit: Optional[int]
+    conversations_remaining: Optional[int]
+    files_count: int
+    files_limit: int
+    files_remaining: int
+
+    @property
+    def usage(self) -> "SubSummary":
+        # El bloque "usage" de la respuesta se lee de los mismos atributos
+        return self
+
+
+PRO_UNLIMITED_MESSAGE = "✅ Conversaciones ilimitadas (Pro)"
+
+
+def check_conversation_limit(user_id: uuid.UUID, db: Session) -> LimitResult:
     """
     Verifica si el usuario puede iniciar una nueva conversación
     
@@ -33,20 +76,15 @@ def check_conversation_limit(user_id: uuid.UUID, db: Session) -> dict:
         db: Sesión de base de datos
     
     Returns:
-        {
-            "allowed": bool,
-            "message": str,
-            "upgrade_required": bool,
-            "usage": dict
-        }
+        LimitResult con el permiso y los contadores de uso
     
     Raises:
         SubscriptionLimitError si alcanzó el límite
     """
-    subscription = get_user_subscription(user_id, db)
-    usage = get_user_usage(user_id, db)
+    # Fila Core de solo lectura: los mismos atributos para suscripción y uso
+    subscription = usage = get_subscription_snapshot(user_id, db)
     
-    if not subscription or not usage:
+    if subscription is None or subscription.usage_id is None:
         raise SubscriptionLimitError("No tienes una susbcripción activa, para continuar actualiza a Pro")
     
     # Verificar si el trial expiró
@@ -65,17 +103,11 @@ def check_conversation_limit(user_id: uuid.UUID, db: Session) -> dict:
     
     # Si es Pro activo, siempre permitir (ilimitado)
     if subscription.plan == "pro" and subscription.status == SubscriptionStatus.ACTIVE:
-        return {
-            "allowed": True,
-            "message": "✅ Conversaciones ilimitadas (Pro)",
-            "upgrade_required": False,
-            "usage": {
-                "conversations_count": usage.conversations_count,
-                "conversations_limit": None,
-                "files_count": usage.files_count,
-                "files_limit": usage.files_limit
-            }
-        }
+        return LimitResult(
+            True, PRO_UNLIMITED_MESSAGE, False,
+            usage.conversations_count, None, None,
+            usage.files_count, usage.files_limit,
+        )
     
     # Verificar límite de conversaciones (Free/Trial)
     if usage.conversations_limit is not None:
@@ -91,18 +123,13 @@ def check_conversation_limit(user_id: uuid.UUID, db: Session) -> dict:
     if usage.conversations_limit is not None:
         remaining = usage.conversations_limit - usage.conversations_count
     
-    return {
-        "allowed": True,
-        "message": f"✅ Te quedan {remaining} conversaciones" if remaining else "✅ Permitido",
-        "upgrade_required": False,
-        "usage": {
-            "conversations_count": usage.conversations_count,
-            "conversations_limit": usage.conversations_limit,
-            "conversations_remaining": remaining,
-            "files_count": usage.files_count,
-            "files_limit": usage.files_limit
-        }
-    }
+    return LimitResult(
+        True,
+        f"✅ Te quedan {remaining} conversaciones" if remaining else "✅ Permitido",
+        False,
+        usage.conversations_count, usage.conversations_limit, remaining,
+        usage.files_count, usage.files_limit,
+    )
 
 
 def check_file_upload_limit(user_id: uuid.UUID, files_to_upload: int, db: Session) -> dict:
@@ -124,10 +151,10 @@ def check_file_upload_limit(user_id: uuid.UUID, files_to_upload: int, db: Sessio
     Raises:
         SubscriptionLimitError si alcanzó el límite
     """
-    subscription = get_user_subscription(user_id, db)
-    usage = get_user_usage(user_id, db)
+    # Fila Core de solo lectura: los mismos atributos para suscripción y uso
+    subscription = usage = get_subscription_snapshot(user_id, db)
     
-    if not subscription or not usage:
+    if subscription is None or subscription.usage_id is None:
         raise SubscriptionLimitError("Subscription no encontrada")
     
     # Verificar si el trial expiró
@@ -168,17 +195,20 @@ def record_conversation_usage(user_id: uuid.UUID, db: Session) -> bool:
     Returns:
         True si se registró exitosamente
     """
-    success = increment_conversation_count(user_id, db)
+    counters = increment_conversation_count(user_id, db)
     
-    if success:
-        usage = get_user_usage(user_id, db)
-        if usage and usage.conversations_limit:
-            remaining = usage.conversations_limit - usage.conversations_count
-            print(f"📊 Conversación registrada. Restantes: {remaining}/{usage.conversations_limit}")
-        else:
-            print(f"📊 Conversación registrada (ilimitado)")
+    if counters is None:
+        return False
     
-    return success
+    # El UPDATE ... RETURNING ya trae los contadores: sin re-consultar
+    conversations_count, conversations_limit = counters
+    if conversations_limit:
+        logger.info("📊 Conversación registrada. Restantes: %s/%s",
+                    conversations_limit - conversations_count, conversations_limit)
+    else:
+        logger.info("📊 Conversación registrada (ilimitado)")
+    
+    return True
 
 
 def record_file_usage(user_id: uuid.UUID, files_count: int, db: Session) -> bool:
@@ -193,20 +223,22 @@ def record_file_usage(user_id: uuid.UUID, files_count: int, db: Session) -> bool
     Returns:
         True si se registró exitosamente
     """
-    for _ in range(files_count):
-        success = increment_file_count(user_id, db)
-        if not success:
-            return False
-    
-    usage = get_user_usage(user_id, db)
-    if usage:
-        remaining = usage.files_limit - usage.files_count
-        print(f"📊 {files_count} archivo(s) registrado(s). Restantes: {remaining}/{usage.files_limit}")
+    # Un solo UPDATE ... RETURNING para todo el lote (antes SELECT + UPDATE
+    # por archivo y un SELECT final para el log)
+    counters = increment_file_count(user_id, db, amount=files_count)
+    if counters is None:
+        logger.warning("⚠️ No se registraron %s archivo(s): el usuario %s no tiene límites de uso",
+                       files_count, user_id)
+        return False
+    
+    new_files_count, files_limit = counters
+    logger.info("📊 %s archivo(s) registrado(s). Restantes: %s/%s",
+                files_count, files_limit - new_files_count, files_limit)
     
     return True
 
 
-def get_subscription_summary(user_id: uuid.UUID, db: Session) -> dict:
+def get_subscription_summary(user_id: uuid.UUID, db: Session) -> Optional[SubSummary]:
     """
     Obtiene un resumen del estado de la suscripción
     
@@ -215,43 +247,38 @@ def get_subscription_summary(user_id: uuid.UUID, db: Session) -> dict:
         db: Sesión de base de datos
     
     Returns:
-        Diccionario con información de la suscripción
+        SubSummary, o None si el usuario no tiene suscripción/uso
     """
-    subscription = get_user_subscription(user_id, db)
-    usage = get_user_usage(user_id, db)
-    
-    if not subscription or not usage:
-        return {
-            "plan": "unknown",
-            "status": "unknown",
-            "usage": {}
-        }
+    # Fila Core de solo lectura: los mismos atributos para suscripción y uso
+    subscription = usage = get_subscription_snapshot(user_id, db)
+    
+    if subscription is None or subscription.usage_id is None:
+        return None
     
     # Calcular días restantes de trial
     days_left = None
     trial_active = False
+    trial_expired = False
     if subscription.status == SubscriptionStatus.TRIALING and subscription.trial_end:
-        delta = subscription.trial_end - datetime.utcnow()
+        # Una sola lectura del reloj para días restantes y expiración
+        now = datetime.utcnow()
+        delta = subscription.trial_end - now
         days_left = max(0, delta.days)
         trial_active = days_left > 0
-    
-    # Verificar si trial expiró
-    trial_expired = check_trial_expired(subscription)
-    
-    return {
-        "plan": subscription.plan.value,
-        "status": subscription.status.value,
-        "trial_active": trial_active,
-        "trial_expired": trial_expired,
-        "days_left": days_left,
-        "current_period_end": subscription.current_period_end.isoformat() if subscription.current_period_end else None,
-        "cancel_at_period_end": subscription.cancel_at_period_end,
-        "usage": {
-            "conversations_count": usage.conversations_count,
-            "conversations_limit": usage.conversations_limit,
-            "conversations_remaining": (usage.conversations_limit - usage.conversations_count) if usage.conversations_limit else None,
-            "files_count": usage.files_count,
-            "files_limit": usage.files_limit,
-            "files_remaining": usage.files_limit - usage.files_count
-        }
-    }
\ No newline at end of file
+        trial_expired = check_trial_expired(subscription, now)
+    
+    return SubSummary(
+        plan=subscription.plan.value,
+        status=subscription.status.value,
+        trial_active=trial_active,
+        trial_expired=trial_expired,
+        days_left=days_left,
+        current_period_end=subscription.current_period_end,
+        cancel_at_period_end=subscription.cancel_at_period_end,
+        conversations_count=usage.conversations_count,
+        conversations_limit=usage.conversations_limit,
+        conversations_remaining=(usage.conversations_limit - usage.conversations_count) if usage.conversations_limit else None,
+        files_count=usage.files_count,
+        files_limit=usage.files_limit,
+        files_remaining=usage.files_limit - usage.files_count,
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, DateTime, Integer
+from sqlalchemy import Column, String, ForeignKey, DateTime, Integer, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from apps.database import Base
@@ -17,4 +17,9 @@ class ContextFile(Base):
     file_hash = Column(String(64), index=True)
     created_at = Column(DateTime, default=datetime.utcnow)  # ← NUEVO
     
-    # path = Column(String(500))  # ← ELIMINAR
\ No newline at end of file
+    # path = Column(String(500))  # ← ELIMINAR
+
+    __table_args__ = (
+        # Un mismo contenido solo puede registrarse una vez por usuario
+        UniqueConstraint("user_id", "file_hash", name="uq_contextfile_user_id_file_hash"),
+    )
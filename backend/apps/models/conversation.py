@@ -1,8 +1,10 @@
 from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, ARRAY, Text, JSON
 from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
 from apps.database import Base
+from apps.models.message import Message
 
 class Conversation(Base):
     __tablename__ = "conversations"
@@ -16,7 +18,15 @@ class Conversation(Base):
     message_count = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    last_message_at = Column(DateTime, default=datetime.utcnow)
+    last_message_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # clave del keyset
     archived_at = Column(DateTime, nullable=True)
     deleted_at = Column(DateTime, nullable=True)
-    context = Column(JSON, default=dict)
\ No newline at end of file
+    context = Column(JSON, default=dict)
+
+    # Solo lectura: los mensajes se crean por conversation_id y el borrado
+    # lo resuelve el ON DELETE CASCADE de la FK
+    messages = relationship(
+        Message,
+        order_by=Message.created_at,
+        viewonly=True,
+    )
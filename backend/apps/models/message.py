@@ -1,5 +1,6 @@
 from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, CheckConstraint
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
+from sqlalchemy.orm import deferred
 from datetime import datetime
 import uuid
 from apps.database import Base
@@ -14,6 +15,9 @@ class Message(Base):
     meta_data = Column(JSONB)
     tokens_used = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Mantenida por trigger en BD (tsvector_update_trigger sobre content);
+    # diferida para no traerla al cargar mensajes.
+    search_tsv = deferred(Column(TSVECTOR))
 
     __table_args__ = (
         CheckConstraint("role IN ('user', 'assistant', 'system')", name="check_role"),
@@ -38,8 +38,8 @@ class OAuthConnection(Base):
         return value
     
     def _is_encrypted(self, value: str) -> bool:
-        #Verifica si un token ya está encriptado (Fernet empieza con 'gAAAAA')
-        return value.startswith('gAAAAA')
+        #Verifica si un token ya está encriptado ('v2:' AES-GCM o Fernet 'gAAAAA')
+        return encryption.is_encrypted(value)
     
     """def _is_encrypted(self, value: str) -> bool:
         try:
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Text, DateTime, func
+
+from apps.database import Base
+
+class ProcessedPayment(Base):
+    """Pagos de Mercado Pago ya aplicados (idempotencia del webhook)"""
+    __tablename__ = "processed_payments"
+
+    payment_id = Column(Text, primary_key=True)
+    processed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,13 +1,10 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, Index, func
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 import uuid
-from passlib.context import CryptContext
 from apps.database import Base
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 class User(Base):
     __tablename__ = "users"
 
@@ -28,6 +25,7 @@ class User(Base):
     last_verification_sent_at = Column(DateTime, nullable=True)
     verification_attempts = Column(Integer, default=0)
 
-
-
-    
\ No newline at end of file
+    __table_args__ = (
+        # Búsquedas por email sin distinguir mayúsculas (login, registro, recuperación)
+        Index("ix_users_email_lower", func.lower(email), unique=True),
+    )
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import uuid
 
@@ -22,3 +22,7 @@ class FilesUploaded(BaseModel):
 
 class FilesDetail(BaseModel):
     file: List[FilesUploaded] = []
+
+
+class DeleteFilesRequest(BaseModel):
+    file_ids: List[uuid.UUID] = Field(..., min_length=1, max_length=100)
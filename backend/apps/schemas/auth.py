@@ -44,6 +44,15 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class UserIdentity(BaseModel):
+    """Identidad mínima del usuario autenticado (cacheada en Redis)"""
+    id: uuid.UUID
+    email: str
+    is_active: bool
+
+    class Config:
+        from_attributes = True
+
 class VerifyEmailRequest(BaseModel):
     email: EmailStr
     code: str = Field(..., min_length=6, max_length=6)
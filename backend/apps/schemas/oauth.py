@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, AliasChoices
 from typing import Optional, List
 from datetime import datetime
 import uuid
@@ -6,7 +6,8 @@ import uuid
 # Response schemas
 class OAuthConnectionResponse(BaseModel):
     id: uuid.UUID
-    service: str
+    # El modelo lo llama `integration`; se acepta también `service` (JSON cacheado)
+    service: str = Field(validation_alias=AliasChoices("service", "integration"))
     service_user_id: Optional[str]
     is_active: bool
     connected_at: datetime
@@ -0,0 +1,20 @@
+from typing import Type, TypeVar
+from pydantic import BaseModel
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def fast_from_orm(model_cls: Type[M], orm_obj, **overrides) -> M:
+    """
+    Construye el schema desde un objeto ORM sin validar (model_construct).
+    Solo para la salida: los tipos ya los garantiza la BD. Los campos que no
+    se llaman igual en el modelo ORM o que son schemas anidados van en
+    `overrides`. Nunca usar con datos que vienen del cliente.
+    """
+    values = {
+        name: getattr(orm_obj, name)
+        for name in model_cls.model_fields
+        if name not in overrides
+    }
+    values.update(overrides)
+    return model_cls.model_construct(**values)
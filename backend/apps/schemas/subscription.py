@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+
+class SubscriptionUsageOut(BaseModel):
+    conversations_count: int
+    conversations_limit: Optional[int] = None
+    conversations_remaining: Optional[int] = None
+    files_count: int
+    files_limit: int
+    files_remaining: int
+
+    class Config:
+        from_attributes = True
+
+
+class SubscriptionSummaryOut(BaseModel):
+    plan: str
+    status: str
+    trial_active: bool
+    trial_expired: bool
+    days_left: Optional[int] = None
+    current_period_end: Optional[datetime] = None
+    cancel_at_period_end: Optional[bool] = None
+    usage: SubscriptionUsageOut
+
+    class Config:
+        from_attributes = True
@@ -3,10 +3,24 @@ from apps.models.conversation import Conversation
 from apps.models.message import Message
 from apps.services.orchestrator.orchestrator_service import orchestrator
 from datetime import datetime
+from string import Template
 from typing import Optional
 import uuid
 from apps.services.llm.llm_service import call_llm
 
+# Prompt de títulos: texto fijo armado una vez al importar el módulo
+TITLE_PROMPT_TEMPLATE = Template(
+    "Eres un asistente que genera títulos cortos y claros para conversaciones de chat.\n"
+    "Tu tarea es crear un título de no más de 6 palabras basado en el mensaje inicial del usuario.\n\n"
+    "Requisitos:\n"
+    "- El título debe ser descriptivo y resumir el tema general del mensaje.\n"
+    "- No uses emojis, comillas, símbolos, ni puntuación innecesaria.\n"
+    "- Usa mayúsculas solo al inicio o en nombres propios.\n"
+    "- Evita frases completas o respuestas; usa un estilo tipo 'Consulta sobre factura' o 'Conexión a Gmail'.\n\n"
+    "Mensaje del usuario:\n${first_message}\n\n"
+    "Devuelve únicamente el título, sin explicación."
+)
+
 class ConversationService:
     
     def get_or_create_active_conversation(self, user_id: uuid.UUID, conversation_id, db: Session) -> Conversation:
@@ -26,7 +40,7 @@ class ConversationService:
         )
         db.add(new_conversation)
         db.commit()
-        db.refresh(new_conversation)
+        # Sin refresh: todos los defaults son del lado Python (id, fechas)
         return new_conversation
 
     
@@ -44,7 +58,7 @@ class ConversationService:
         )
         db.add(message)
         db.commit()
-        db.refresh(message)
+        # Sin refresh: los atributos expirados se recargan solo si se leen
         return message
     
     def save_assistant_message(
@@ -63,18 +77,18 @@ class ConversationService:
         )
         db.add(message)
         db.commit()
-        db.refresh(message)
+        # Sin refresh: los atributos expirados se recargan solo si se leen
         return message
     
 
     
-    async def update_conversation_title(self, conversation_id: uuid.UUID, first_message: str, user_id: uuid.UUID, db: Session):
+    async def update_conversation_title(self, conversation_id: uuid.UUID, first_message: str, user_id: uuid.UUID, db: Session, title: Optional[str] = None):
         conversation = db.query(Conversation).filter_by(id=conversation_id).first()
         if conversation and conversation.title == "Nueva conversacion":
-            title = await self.generate_smart_title(first_message, user_id)
+            # El título puede venir ya generado (llamada al LLM lanzada antes)
+            title = title or await self.generate_smart_title(first_message, user_id)
             conversation.title = title
             db.commit()
-            db.refresh(conversation)
             print(f"✅ Título actualizado: {title}")
             return title
         return None
@@ -86,17 +100,7 @@ class ConversationService:
         Usa el LLM para generar un título corto y descriptivo del primer mensaje.
         Si el modelo no responde, se genera un título genérico basado en el mensaje.
         """
-        prompt = (
-            "Eres un asistente que genera títulos cortos y claros para conversaciones de chat.\n"
-            "Tu tarea es crear un título de no más de 6 palabras basado en el mensaje inicial del usuario.\n\n"
-            "Requisitos:\n"
-            "- El título debe ser descriptivo y resumir el tema general del mensaje.\n"
-            "- No uses emojis, comillas, símbolos, ni puntuación innecesaria.\n"
-            "- Usa mayúsculas solo al inicio o en nombres propios.\n"
-            "- Evita frases completas o respuestas; usa un estilo tipo 'Consulta sobre factura' o 'Conexión a Gmail'.\n\n"
-            f"Mensaje del usuario:\n{first_message}\n\n"
-            "Devuelve únicamente el título, sin explicación."
-        )
+        prompt = TITLE_PROMPT_TEMPLATE.substitute(first_message=first_message)
 
         try:
             result = await call_llm(prompt)
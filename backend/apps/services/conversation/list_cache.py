@@ -0,0 +1,74 @@
+"""
+list_cache.py
+Cache en Redis de la primera página de GET /conversations por (usuario, status).
+
+Las claves llevan un número de versión por usuario; cualquier cambio en sus
+conversaciones hace INCR de la versión y las páginas anteriores quedan
+huérfanas (expiran solas por TTL).
+"""
+
+from typing import Optional, Tuple
+import logging
+import uuid
+
+from apps.redis_client import redis
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_LIST_CACHE_TTL = 30
+
+
+def _version_key(user_id: uuid.UUID) -> str:
+    return f"conv:list:{user_id}:ver"
+
+
+async def first_page_key(user_id: uuid.UUID, status: str) -> Optional[str]:
+    """
+    Clave versionada de la primera página. Se resuelve UNA vez, antes de
+    consultar la BD, y se usa tanto para leer como para escribir: si otro
+    request hace INCR en medio, las filas viejas quedan bajo la versión
+    vieja y nunca se sirven con la nueva.
+
+    Returns:
+        La clave, o None si Redis no está disponible
+    """
+    try:
+        version = await redis.get(_version_key(user_id)) or "0"
+    except Exception as e:
+        logger.warning("⚠️ Redis no disponible para listado de conversaciones: %s", e)
+        return None
+    return f"conv:list:{user_id}:{status}:v{version}"
+
+
+async def get_cached_first_page(key: str) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Returns:
+        (body JSON, next_cursor) si hay hit, None si no
+    """
+    try:
+        cached = await redis.hgetall(key)
+    except Exception as e:
+        logger.warning("⚠️ Redis no disponible para listado de conversaciones: %s", e)
+        return None
+
+    if not cached:
+        return None
+    return cached["body"], cached.get("cursor") or None
+
+
+async def cache_first_page(key: str, body: bytes, next_cursor: Optional[str]) -> None:
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={"body": body, "cursor": next_cursor or ""})
+            pipe.expire(key, CONVERSATION_LIST_CACHE_TTL)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("⚠️ Error cacheando listado de conversaciones: %s", e)
+
+
+async def invalidate_conversation_list(user_id: uuid.UUID) -> None:
+    """Llamar tras crear/archivar/restaurar/eliminar o al recibir mensajes nuevos"""
+    try:
+        await redis.incr(_version_key(user_id))
+    except Exception as e:
+        logger.warning("⚠️ Error invalidando listado de conversaciones: %s", e)
@@ -1,31 +1,78 @@
 from qdrant_client import QdrantClient
 from qdrant_client.http.exceptions import ResponseHandlingException
-from qdrant_client.models import VectorParams, Distance, PointStruct, PayloadSchemaType
+from qdrant_client.models import (
+    VectorParams, Distance, PointStruct, PayloadSchemaType,
+    Filter, FieldCondition, MatchValue,
+)
 import google.generativeai as genai
+import logging
 import uuid
 import time
-from config import QDRANT_API_KEY, QDRANT_URL, QDRANT_COLLECTION_NAME, GOOGLE_API_KEY
+import threading
+from cachetools import TTLCache
+from apps.services.memory.semantic_cache import SemanticCache
+from config import QDRANT_API_KEY, QDRANT_URL, QDRANT_COLLECTION_NAME, QDRANT_PREFER_GRPC, GOOGLE_API_KEY
+
+logger = logging.getLogger(__name__)
 
 COLLECTION_NAME = QDRANT_COLLECTION_NAME
 VECTOR_SIZE = 3072  
 
 genai.configure(api_key=GOOGLE_API_KEY)
 
-# ✅ Reemplázalo con esto
+# Cliente único por proceso: reutiliza la conexión (keep-alive / HTTP2 en gRPC)
+# entre requests. El lock evita crear dos clientes cuando varios hilos
+# (asyncio.to_thread) llaman a get_client() a la vez en frío.
 _client = None
+_client_lock = threading.Lock()
 
 def get_client() -> QdrantClient:
     global _client
     if _client is None:
-        _client = QdrantClient(
-            url=QDRANT_URL,
-            api_key=QDRANT_API_KEY,
-            timeout=30,
-            prefer_grpc=False
-        )
+        with _client_lock:
+            if _client is None:
+                _client = QdrantClient(
+                    url=QDRANT_URL,
+                    api_key=QDRANT_API_KEY,
+                    timeout=30,
+                    prefer_grpc=QDRANT_PREFER_GRPC
+                )
     return _client
 
 
+# --- Caché de search_context ---
+# Clave: (query normalizada, user_id, conversation_id, limit, threshold).
+# store_message(s) descarta las entradas de su conversación para que un mensaje
+# recién indexado no quede oculto tras un resultado cacheado.
+SEARCH_CACHE_TTL = 300
+_search_cache = TTLCache(maxsize=2048, ttl=SEARCH_CACHE_TTL)
+_search_cache_lock = threading.RLock()
+_search_cache_stats = {"hits": 0, "misses": 0}
+
+
+# Segundo nivel: paráfrasis de una query reciente (coseno >= 0.95) reutilizan
+# su contexto. Ahorra la búsqueda en Qdrant, no el embedding.
+SEMANTIC_CACHE_THRESHOLD = 0.95
+_semantic_cache = SemanticCache(dim=VECTOR_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD)
+_search_cache_stats["semantic_hits"] = 0
+
+
+def _search_cache_key(query, user_id, conversation_id, limit, score_threshold):
+    return (query.strip().lower(), user_id, conversation_id, limit, score_threshold)
+
+
+def _invalidate_search_cache(conversation_id):
+    with _search_cache_lock:
+        for key in [k for k in _search_cache.keys() if k[2] == conversation_id]:
+            _search_cache.pop(key, None)
+    _semantic_cache.invalidate(conversation_id)
+
+
+def get_search_cache_stats() -> dict:
+    with _search_cache_lock:
+        return {**_search_cache_stats, "size": len(_search_cache)}
+
+
 def get_embedding(text: str) -> list:
     result = genai.embed_content(
         model="models/gemini-embedding-2",
@@ -34,6 +81,15 @@ def get_embedding(text: str) -> list:
     return result["embedding"]
 
 
+def get_embeddings(texts: list) -> list:
+    """Embeddings de varios textos en una sola llamada a la API."""
+    result = genai.embed_content(
+        model="models/gemini-embedding-2",
+        content=texts,
+    )
+    return result["embedding"]
+
+
 # --- Validar que la colección tiene la config correcta ---
 def _is_collection_config_valid() -> bool:
     try:
@@ -120,25 +176,74 @@ def store_message(text, metadata=None, max_retries=3):
                     )
                 ]
             )
-            print(f"✅ Mensaje guardado en Qdrant: {point_id}")
+            logger.info("✅ Mensaje guardado en Qdrant: %s", point_id)
+            _invalidate_search_cache((metadata or {}).get("conversation_id"))
             return point_id
 
         except (ResponseHandlingException, Exception) as e:
-            print(f"❌ Error guardando en Qdrant (intento {attempt + 1}/{max_retries}): {e}")
+            logger.error("❌ Error guardando en Qdrant (intento %d/%d): %s", attempt + 1, max_retries, e)
+            if attempt < max_retries - 1:
+                time.sleep(1)
+            else:
+                logger.warning("⚠️ No se pudo guardar en Qdrant. Continuando sin almacenar.")
+                return None
+
+
+# --- Guardar varios textos en Qdrant con un solo embedding + upsert ---
+def store_messages(texts, metadatas=None, max_retries=3):
+    metadatas = metadatas or [None] * len(texts)
+    for attempt in range(max_retries):
+        try:
+            vectors = get_embeddings(list(texts))
+            points = [
+                PointStruct(
+                    id=str(uuid.uuid4()),
+                    vector=vector,
+                    payload={"text": text, **(metadata or {})}
+                )
+                for text, vector, metadata in zip(texts, vectors, metadatas)
+            ]
+
+            get_client().upsert(collection_name=COLLECTION_NAME, points=points)
+            point_ids = [point.id for point in points]
+            logger.info("✅ %d mensajes guardados en Qdrant", len(point_ids))
+            for conversation_id in {(m or {}).get("conversation_id") for m in metadatas}:
+                _invalidate_search_cache(conversation_id)
+            return point_ids
+
+        except (ResponseHandlingException, Exception) as e:
+            logger.error("❌ Error guardando en Qdrant (intento %d/%d): %s", attempt + 1, max_retries, e)
             if attempt < max_retries - 1:
                 time.sleep(1)
             else:
-                print("⚠️ No se pudo guardar en Qdrant. Continuando sin almacenar.")
+                logger.warning("⚠️ No se pudo guardar en Qdrant. Continuando sin almacenar.")
                 return None
 
 
 # --- Buscar contexto relevante con retry ---
 def search_context(query, user_id=None, conversation_id=None, limit=10, score_threshold=0.5, max_retries=3):
-    from qdrant_client.models import Filter, FieldCondition, MatchValue
+    with _search_cache_lock:
+        cache_key = _search_cache_key(query, user_id, conversation_id, limit, score_threshold)
+        cached = _search_cache.get(cache_key)
+        if cached is not None:
+            _search_cache_stats["hits"] += 1
+            return list(cached)
+        _search_cache_stats["misses"] += 1
+
+    semantic_scope = (user_id, conversation_id, limit, score_threshold)
+    query_vector = None
 
     for attempt in range(max_retries):
         try:
-            query_vector = get_embedding(query)
+            if query_vector is None:
+                query_vector = get_embedding(query)
+
+                cached = _semantic_cache.lookup(semantic_scope, query_vector)
+                if cached is not None:
+                    with _search_cache_lock:
+                        _search_cache_stats["semantic_hits"] += 1
+                        _search_cache[cache_key] = tuple(cached)
+                    return cached
 
             conditions = []
             if user_id:
@@ -157,15 +262,18 @@ def search_context(query, user_id=None, conversation_id=None, limit=10, score_th
             )
 
             context_texts = [hit.payload["text"] for hit in results]
-            print(f"✅ Contexto encontrado: {len(context_texts)} mensajes (threshold={score_threshold})")
+            logger.info("✅ Contexto encontrado: %d mensajes (threshold=%s)", len(context_texts), score_threshold)
+            with _search_cache_lock:
+                _search_cache[cache_key] = tuple(context_texts)
+            _semantic_cache.add(semantic_scope, query_vector, context_texts)
             return context_texts
 
         except (ResponseHandlingException, Exception) as e:
-            print(f"❌ Error buscando en Qdrant (intento {attempt + 1}/{max_retries}): {e}")
+            logger.error("❌ Error buscando en Qdrant (intento %d/%d): %s", attempt + 1, max_retries, e)
             if attempt < max_retries - 1:
                 time.sleep(1)
             else:
-                print("⚠️ No se pudo buscar en Qdrant. Retornando contexto vacío.")
+                logger.warning("⚠️ No se pudo buscar en Qdrant. Retornando contexto vacío.")
                 return []
 
 
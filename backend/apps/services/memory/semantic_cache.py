@@ -0,0 +1,91 @@
+"""
+semantic_cache.py
+Caché semántica para search_context: si una query nueva es casi idéntica
+(similitud coseno >= threshold) a otra reciente del mismo scope, se reutiliza
+su contexto y se evita la búsqueda en Qdrant.
+
+El scope (usuario, conversación, parámetros de búsqueda) aísla las entradas:
+nunca se comparte contexto entre usuarios ni conversaciones.
+"""
+
+from collections import OrderedDict
+from typing import Optional, Hashable, List
+import threading
+
+import numpy as np  # Dependencia de qdrant-client
+
+
+class _ScopeBuffer:
+    """Ring buffer preasignado de embeddings normalizados + contextos"""
+
+    __slots__ = ("matrix", "contexts", "count", "next")
+
+    def __init__(self, max_entries: int, dim: int):
+        self.matrix = np.zeros((max_entries, dim), dtype=np.float32)
+        self.contexts: List[Optional[tuple]] = [None] * max_entries
+        self.count = 0
+        self.next = 0
+
+
+class SemanticCache:
+
+    def __init__(self, dim: int, threshold: float = 0.95, max_entries: int = 16, max_scopes: int = 128):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_scopes = max_scopes
+        self._scopes: "OrderedDict[Hashable, _ScopeBuffer]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> Optional[np.ndarray]:
+        q = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if not norm:
+            return None
+        return q / norm
+
+    def lookup(self, scope: Hashable, vector) -> Optional[list]:
+        """Contexto cacheado de la query más parecida del scope, o None"""
+        q = self._normalize(vector)
+        if q is None:
+            return None
+
+        with self._lock:
+            buffer = self._scopes.get(scope)
+            if buffer is None or buffer.count == 0:
+                return None
+            self._scopes.move_to_end(scope)
+
+            # Un solo producto matriz-vector (BLAS) contra todo el scope
+            scores = buffer.matrix[:buffer.count] @ q
+            best = int(scores.argmax())
+            if scores[best] >= self.threshold:
+                return list(buffer.contexts[best])
+        return None
+
+    def add(self, scope: Hashable, vector, contexts: list) -> None:
+        q = self._normalize(vector)
+        if q is None:
+            return
+
+        with self._lock:
+            buffer = self._scopes.get(scope)
+            if buffer is None:
+                buffer = _ScopeBuffer(self.max_entries, self.dim)
+                self._scopes[scope] = buffer
+                if len(self._scopes) > self.max_scopes:
+                    self._scopes.popitem(last=False)
+            else:
+                self._scopes.move_to_end(scope)
+
+            buffer.matrix[buffer.next] = q
+            buffer.contexts[buffer.next] = tuple(contexts)
+            buffer.next = (buffer.next + 1) % self.max_entries
+            buffer.count = min(buffer.count + 1, self.max_entries)
+
+    def invalidate(self, conversation_id) -> None:
+        """Descarta los scopes de una conversación (scope[1] == conversation_id)"""
+        with self._lock:
+            for scope in [s for s in self._scopes if s[1] == conversation_id]:
+                del self._scopes[scope]
@@ -0,0 +1,41 @@
+"""
+connections_cache.py
+Cache en Redis de las conexiones OAuth activas por usuario (GET /oauth/connections).
+
+Se invalida al conectar/desconectar desde la API y cuando un servicio marca
+la conexión como inactiva al fallar el refresh de token. Los servicios son
+síncronos, por eso la invalidación también tiene versión con cliente sync.
+"""
+
+import logging
+
+from redis import Redis as SyncRedis
+
+from apps.redis_client import redis
+from config import REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+OAUTH_CONNECTIONS_CACHE_TTL = 60
+
+# Solo para invalidar desde código síncrono (refresh de tokens)
+_sync_redis = SyncRedis.from_url(REDIS_URL, decode_responses=True)
+
+
+def connections_cache_key(user_id) -> str:
+    return f"oauth:{user_id}:connections"
+
+
+async def invalidate_connections_cache(user_id) -> None:
+    try:
+        await redis.delete(connections_cache_key(user_id))
+    except Exception as e:
+        logger.warning("⚠️ Error invalidando conexiones OAuth: %s", e)
+
+
+def invalidate_connections_cache_sync(user_id) -> None:
+    """Igual que invalidate_connections_cache, para los servicios síncronos"""
+    try:
+        _sync_redis.delete(connections_cache_key(user_id))
+    except Exception as e:
+        logger.warning("⚠️ Error invalidando conexiones OAuth: %s", e)
@@ -1,8 +1,11 @@
+import orjson
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, Dict, Any
 
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from google.auth.transport.requests import Request
 from google.auth.exceptions import RefreshError
 
@@ -11,6 +14,20 @@ from apps.database import SessionLocal
 from apps.models.oauth_connection import OAuthConnection
 from abc import ABC, abstractmethod
 from apps.models.user import User
+from apps.services.oauth.connections_cache import invalidate_connections_cache_sync
+from config import GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET
+
+
+@lru_cache(maxsize=None)
+def _discovery_document(service_name: str, api_version: str) -> Optional[str]:
+    """
+    Documento de discovery (incluido en googleapiclient) leído del disco una
+    sola vez por proceso; build() lo relee en cada llamada, y cada tool de
+    Gmail/Sheets construye su cliente.
+    Se cachea el JSON crudo, no el dict: build_from_document modifica las
+    descripciones de los métodos en sitio, así que cada build necesita su copia.
+    """
+    return get_static_doc(service_name, api_version) or None
 
 
 class GoogleServiceBase(ABC):
@@ -66,7 +83,11 @@ class GoogleServiceBase(ABC):
             db.commit()
 
             # Construir y devolver el cliente del servicio
-            return build(self.service_name, self.api_version, credentials=creds)
+            document = _discovery_document(self.service_name, self.api_version)
+            if document is None:
+                return build(self.service_name, self.api_version, credentials=creds)
+            # Copia propia por build (orjson: parseo en C)
+            return build_from_document(orjson.loads(document), credentials=creds)
 
         finally:
             db.close()
@@ -213,8 +234,6 @@ class GoogleServiceBase(ABC):
         Raises:
             ValueError: Si faltan las variables de entorno GOOGLE_CLIENT_ID o GOOGLE_CLIENT_SECRET
         """
-        from config import GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET
-        
         # Validar que existan las variables de entorno
         if not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
             raise ValueError(
@@ -300,6 +319,7 @@ class GoogleServiceBase(ABC):
             print(f"❌ RefreshError para {self.service_name}: {e}")
             oauth_conn.is_active = False
             db.commit()
+            invalidate_connections_cache_sync(oauth_conn.user_id)
             
             raise ValueError(
                 f"Token de {self.service_name.title()} inválido o revocado. "
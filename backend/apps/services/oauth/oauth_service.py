@@ -4,6 +4,7 @@ from apps.models.oauth_connection import OAuthConnection
 from apps.models.user import User  # 🔥 Importante para cargar metadatos de la tabla 'users'
 from apps.core.encryption import encryption
 from .utils import parse_integration, get_integration_config
+from .connections_cache import invalidate_connections_cache_sync
 from .providers.factory_selector import get_oauth_provider
 import os
 #import secrets
@@ -231,6 +232,7 @@ class OAuthService:
             oauth_conn.is_active = False
             try:
                 db.commit()
+                invalidate_connections_cache_sync(oauth_conn.user_id)
             except Exception:
                 db.rollback()
             raise ValueError(f"Tu conexión con {oauth_conn.integration} ha expirado y no se pudo renovar. Por favor, vuelve a conectarla. Detalle: {str(e)}")
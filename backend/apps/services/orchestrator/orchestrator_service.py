@@ -3,6 +3,7 @@ from typing import Callable, Awaitable, Optional
 
 #import google.adk as adk  # noqa: F401
 from google.adk.agents import Agent
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
 #from google.adk.events import Event
 from google.adk.sessions import InMemorySessionService
@@ -11,6 +12,8 @@ from google.genai.types import Content, Part
 import google.generativeai as genai
 
 from integrations import TOOL_REGISTRY
+from apps.database import SessionLocal
+from apps.services.oauth.oauth_service import oauth_service
 from apps.services.prompt.agent_identity import build_system_prompt
 from apps.services.orchestrator.intent_classifier import classify_intent
 from config import GOOGLE_API_KEY, MODEL_GOOGLE_IA
@@ -22,14 +25,16 @@ genai.configure(api_key=GOOGLE_API_KEY)
 
 EventCallback = Optional[Callable[[str, dict], Awaitable[None]]]
 
+# Con event_callback el modelo responde en modo streaming: cada fragmento de
+# texto llega como evento parcial y se reenvía como "token". El evento final
+# (no parcial) sigue trayendo el texto completo.
+_STREAMING_RUN_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
 def _get_disconnected_apps_from_db(user_id: str) -> list[str]:
-    from apps.services.oauth.oauth_service import oauth_service
-    from apps.database import SessionLocal
-
     app_integrations = {
         "gmail":      "Gmail",
         "sheets":     "Sheets",
@@ -167,7 +172,16 @@ async def orchestrator(
                 new_message=Content(parts=[Part(text=message_to_send)]),
                 session_id=session_id,
                 user_id=session_key,
+                run_config=_STREAMING_RUN_CONFIG if event_callback else RunConfig(),
             ):
+                # Fragmento de texto en streaming: se reenvía y no cuenta como step
+                if getattr(event, "partial", False):
+                    if event_callback and event.content and event.content.parts:
+                        chunk = "".join(p.text for p in event.content.parts if getattr(p, "text", None))
+                        if chunk:
+                            await event_callback("token", {"text": chunk})
+                    continue
+
                 total_steps += 1
 
                 # ── Debug (quitar en producción) ──────────────────────────────
@@ -3,11 +3,13 @@ subscription_service.py
 Lógica de negocio para gestionar suscripciones
 """
 
+from sqlalchemy import bindparam, func, select, update, or_
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
 from apps.models.subscription import Subscription, UsageLimits, PlanType, SubscriptionStatus
 from apps.models.user import User
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 import uuid
 
 
@@ -46,7 +48,6 @@ def create_trial_subscription(user_id: uuid.UUID, db: Session) -> Subscription:
     db.add(usage_limits)
     
     db.commit()
-    db.refresh(subscription)
     
     print(f"✅ Trial creado para user {user_id}: {trial_end}")
     
@@ -64,7 +65,9 @@ def get_user_subscription(user_id: uuid.UUID, db: Session) -> Optional[Subscript
     Returns:
         Subscription o None
     """
-    return db.query(Subscription).filter(Subscription.user_id == user_id).first()
+    return db.execute(
+        select(Subscription).where(Subscription.user_id == user_id)
+    ).scalars().first()
 
 
 def get_user_usage(user_id: uuid.UUID, db: Session) -> Optional[UsageLimits]:
@@ -78,7 +81,70 @@ def get_user_usage(user_id: uuid.UUID, db: Session) -> Optional[UsageLimits]:
     Returns:
         UsageLimits o None
     """
-    return db.query(UsageLimits).filter(UsageLimits.user_id == user_id).first()
+    return db.execute(
+        select(UsageLimits).where(UsageLimits.user_id == user_id)
+    ).scalars().first()
+
+
+def get_subscription_with_usage(
+    user_id: uuid.UUID,
+    db: Session
+) -> Tuple[Optional[Subscription], Optional[UsageLimits]]:
+    """
+    Obtiene suscripción y límites de uso en una sola consulta (LEFT JOIN)
+    
+    Args:
+        user_id: ID del usuario
+        db: Sesión de base de datos
+    
+    Returns:
+        (Subscription o None, UsageLimits o None)
+    """
+    row = db.execute(
+        select(Subscription, UsageLimits)
+        .outerjoin(UsageLimits, UsageLimits.user_id == Subscription.user_id)
+        .where(Subscription.user_id == user_id)
+    ).first()
+
+    if row is None:
+        return None, None
+    return row[0], row[1]
+
+
+# Solo las columnas que leen los checks del middleware: filas Core, sin
+# instanciar objetos ORM ni pasar por el identity map. La sentencia se arma
+# una vez; cada llamada solo aporta el parámetro :user_id.
+_SUBSCRIPTION_SNAPSHOT_STMT = (
+    select(
+        Subscription.plan,
+        Subscription.status,
+        Subscription.trial_end,
+        Subscription.current_period_end,
+        Subscription.cancel_at_period_end,
+        UsageLimits.id.label("usage_id"),
+        UsageLimits.conversations_count,
+        UsageLimits.conversations_limit,
+        UsageLimits.files_count,
+        UsageLimits.files_limit,
+    )
+    .outerjoin(UsageLimits, UsageLimits.user_id == Subscription.user_id)
+    .where(Subscription.user_id == bindparam("user_id"))
+)
+
+
+def get_subscription_snapshot(user_id: uuid.UUID, db: Session) -> Optional[Row]:
+    """
+    Lectura de solo-lectura de suscripción + límites para los checks por
+    request (una fila con atributos plan, status, trial_end, ..., files_limit)
+    
+    Args:
+        user_id: ID del usuario
+        db: Sesión de base de datos
+    
+    Returns:
+        Row o None si no hay suscripción (usage_id es None si no hay límites)
+    """
+    return db.execute(_SUBSCRIPTION_SNAPSHOT_STMT, {"user_id": user_id}).first()
 
 
 def upgrade_to_pro(
@@ -103,7 +169,8 @@ def upgrade_to_pro(
     Returns:
         Subscription actualizada
     """
-    subscription = get_user_subscription(user_id, db)
+    # Suscripción y límites en una sola consulta
+    subscription, usage_limits = get_subscription_with_usage(user_id, db)
     
     if not subscription:
         raise ValueError(f"Subscription no encontrada para user {user_id}")
@@ -118,13 +185,11 @@ def upgrade_to_pro(
     subscription.trial_end = None  # Ya no está en trial
     
     # Actualizar límites de uso para Pro
-    usage_limits = get_user_usage(user_id, db)
     if usage_limits:
         usage_limits.conversations_limit = None  # Ilimitado
         usage_limits.files_limit = 100
     
     db.commit()
-    db.refresh(subscription)
     
     print(f"✅ Usuario {user_id} actualizado a Pro")
     
@@ -142,7 +207,8 @@ def downgrade_to_free(user_id: uuid.UUID, db: Session) -> Subscription:
     Returns:
         Subscription actualizada
     """
-    subscription = get_user_subscription(user_id, db)
+    # Suscripción y límites en una sola consulta
+    subscription, usage_limits = get_subscription_with_usage(user_id, db)
     
     if not subscription:
         raise ValueError(f"Subscription no encontrada para user {user_id}")
@@ -153,25 +219,25 @@ def downgrade_to_free(user_id: uuid.UUID, db: Session) -> Subscription:
     subscription.canceled_at = datetime.utcnow()
     
     # Actualizar límites de uso a Free
-    usage_limits = get_user_usage(user_id, db)
     if usage_limits:
         usage_limits.conversations_limit = 20
         usage_limits.files_limit = 5
     
     db.commit()
-    db.refresh(subscription)
     
     print(f"✅ Usuario {user_id} degradado a Free")
     
     return subscription
 
 
-def check_trial_expired(subscription: Subscription) -> bool:
+def check_trial_expired(subscription, now: Optional[datetime] = None) -> bool:
     """
     Verifica si el trial ha expirado
     
     Args:
-        subscription: Subscription a verificar
+        subscription: Subscription (o snapshot con status / trial_end) a verificar
+        now: Instante de referencia (UTC naive) si el llamador ya lo tiene;
+             solo se lee el reloj cuando el trial sigue en curso
     
     Returns:
         True si expiró, False si no
@@ -182,62 +248,73 @@ def check_trial_expired(subscription: Subscription) -> bool:
     if not subscription.trial_end:
         return False
     
-    return datetime.utcnow() > subscription.trial_end
+    return (now or datetime.utcnow()) > subscription.trial_end
 
 
-def increment_conversation_count(user_id: uuid.UUID, db: Session) -> bool:
+def increment_conversation_count(
+    user_id: uuid.UUID,
+    db: Session
+) -> Optional[Tuple[int, Optional[int]]]:
     """
-    Incrementa el contador de conversaciones
+    Incrementa el contador de conversaciones con un único UPDATE atómico
+    (comprobación de límite + incremento + lectura en un solo round-trip,
+    sin carrera entre turnos simultáneos del mismo usuario)
     
     Args:
         user_id: ID del usuario
         db: Sesión de base de datos
     
     Returns:
-        True si se incrementó, False si alcanzó el límite
+        (conversations_count, conversations_limit) tras incrementar,
+        o None si no hay límites registrados o se alcanzó el límite
     """
-    usage = get_user_usage(user_id, db)
-    
-    if not usage:
-        return False
-    
-    # Si es ilimitado (Pro), siempre permitir
-    if usage.conversations_limit is None:
-        usage.conversations_count += 1
-        db.commit()
-        return True
-    
-    # Si no alcanzó el límite, incrementar
-    if usage.conversations_count < usage.conversations_limit:
-        usage.conversations_count += 1
-        db.commit()
-        return True
+    row = db.execute(
+        update(UsageLimits)
+        .where(
+            UsageLimits.user_id == user_id,
+            or_(
+                UsageLimits.conversations_limit.is_(None),  # Ilimitado (Pro)
+                UsageLimits.conversations_count < UsageLimits.conversations_limit,
+            ),
+        )
+        .values(conversations_count=UsageLimits.conversations_count + 1)
+        .returning(UsageLimits.conversations_count, UsageLimits.conversations_limit)
+    ).first()
+    db.commit()
     
-    # Alcanzó el límite
-    return False
+    if row is None:
+        return None
+    return row[0], row[1]
 
 
-def increment_file_count(user_id: uuid.UUID, db: Session) -> bool:
+def increment_file_count(
+    user_id: uuid.UUID,
+    db: Session,
+    amount: int = 1
+) -> Optional[Tuple[int, int]]:
     """
-    Incrementa el contador de archivos
+    Incrementa el contador de archivos en `amount` con un único UPDATE
+    atómico. Los archivos ya están guardados cuando se llama, así que se
+    cuentan siempre, con tope en files_limit (dos subidas concurrentes
+    pueden pasar ambas check_file_upload_limit)
     
     Args:
         user_id: ID del usuario
         db: Sesión de base de datos
+        amount: Cantidad de archivos a registrar
     
     Returns:
-        True si se incrementó, False si alcanzó el límite
+        (files_count, files_limit) tras incrementar,
+        o None si no hay límites registrados
     """
-    usage = get_user_usage(user_id, db)
-    
-    if not usage:
-        return False
-    
-    # Verificar límite
-    if usage.files_count < usage.files_limit:
-        usage.files_count += 1
-        db.commit()
-        return True
+    row = db.execute(
+        update(UsageLimits)
+        .where(UsageLimits.user_id == user_id)
+        .values(files_count=func.least(UsageLimits.files_count + amount, UsageLimits.files_limit))
+        .returning(UsageLimits.files_count, UsageLimits.files_limit)
+    ).first()
+    db.commit()
     
-    # Alcanzó el límite
-    return False
\ No newline at end of file
+    if row is None:
+        return None
+    return row[0], row[1]
\ No newline at end of file
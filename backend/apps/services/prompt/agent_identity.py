@@ -4,6 +4,8 @@ Define la identidad, capacidades y guías del agente AssistWork.
 Separado en secciones: base (siempre) + condicionales (solo si aplican).
 """
 
+from functools import lru_cache
+
 # ─────────────────────────────────────────────
 # NÚCLEO — Identidad Base (~100 tokens)
 # ─────────────────────────────────────────────
@@ -78,6 +80,21 @@ def build_system_prompt(
     """
     Construye el system prompt de forma dinámica según la intención y el contexto.
     """
+    return _compose_system_prompt(
+        intent,
+        tuple(disconnected_apps) if disconnected_apps else (),
+        has_tool_error,
+    )
+
+
+@lru_cache(maxsize=256)
+def _compose_system_prompt(
+    intent: str,
+    disconnected_apps: tuple[str, ...],
+    has_tool_error: bool,
+) -> str:
+    # Pocas combinaciones posibles (intención × apps desconectadas × error):
+    # cada prompt se arma una vez y se reutiliza en los turnos siguientes
     sections = [AGENT_IDENTITY]
 
     # Reglas de herramientas solo si es una tarea
@@ -13,6 +13,7 @@ import base64
 import json
 import uuid
 import re
+from typing import BinaryIO
 from config import GCS_BUCKET_NAME, GCS_CREDENTIALS_BASE64, logger
 
 
@@ -24,11 +25,20 @@ def sanitize_filename(name: str) -> str:
     name = re.sub(r"[^a-zA-Z0-9._-]", "_", name)
     return name
 
-def validate_pdf(file_content: bytes) -> bool:
+PDF_TRAILER_WINDOW = 1024
+
+
+def validate_pdf(header: bytes, trailer: bytes = b"") -> bool:
     """
-    Verifica que el archivo sea realmente un PDF usando magic bytes
+    Verifica que el archivo sea realmente un PDF usando magic bytes:
+    cabecera `%PDF-` y marcador `%%EOF` en los últimos 1024 bytes.
+    No parsea el documento, solo mira los extremos del archivo.
+
+    Args:
+        header: Primeros bytes del archivo (basta con 8)
+        trailer: Últimos PDF_TRAILER_WINDOW bytes del archivo
     """
-    return file_content.startswith(b"%PDF")
+    return header.startswith(b"%PDF-") and b"%%EOF" in trailer[-PDF_TRAILER_WINDOW:]
 
 # Inicializar cliente GCS
 def get_storage_client():
@@ -52,6 +62,9 @@ def get_storage_client():
 storage_client = get_storage_client()
 bucket = storage_client.bucket(GCS_BUCKET_NAME)
 
+# Tamaño de bloque para subidas resumibles (múltiplo de 256 KB exigido por GCS)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
 
 def upload_file(file_content: bytes, user_id: str, original_filename: str, file_hash: str = None) -> dict:
     """
@@ -93,7 +106,53 @@ def upload_file(file_content: bytes, user_id: str, original_filename: str, file_
     except Exception as e:
         logger.info(f"❌ Error subiendo a GCS: {e}")
         return {"success": False, "error": str(e)}
-    
+
+
+def upload_file_stream(file_obj: BinaryIO, user_id: str, original_filename: str, file_hash: str, file_size: int) -> dict:
+    """
+    Sube un archivo a GCS leyendo desde un file-like por bloques,
+    sin cargar el contenido completo en memoria.
+
+    Args:
+        file_obj: Archivo posicionado al inicio (ej: UploadFile.file)
+        user_id: ID del usuario
+        original_filename: Nombre original del archivo
+        file_hash: SHA-256 del contenido (define el nombre en GCS)
+        file_size: Tamaño total en bytes
+
+    Returns:
+        Mismo formato que upload_file
+    """
+    try:
+        safe_name = sanitize_filename(original_filename)
+        file_extension = os.path.splitext(safe_name)[1].lower()
+
+        gcs_path = f"users/{user_id}/documents/{file_hash}{file_extension}"
+        blob = bucket.blob(gcs_path, chunk_size=UPLOAD_CHUNK_SIZE)
+
+        if blob.exists():
+            logger.info(f"ℹ️ Archivo ya existe en GCS, omitiendo subida: {gcs_path}")
+            return {
+                "success": True,
+                "gcs_path": gcs_path,
+                "file_size": file_size,
+                "already_existed": True
+            }
+
+        blob.upload_from_file(file_obj, size=file_size, content_type="application/pdf")
+
+        logger.info(f"✅ Nuevo archivo subido a GCS: {gcs_path}")
+        return {
+            "success": True,
+            "gcs_path": gcs_path,
+            "file_size": file_size,
+            "already_existed": False
+        }
+
+    except Exception as e:
+        logger.info(f"❌ Error subiendo a GCS: {e}")
+        return {"success": False, "error": str(e)}
+
 
 def download_to_memory(gcs_path: str) -> BytesIO:
     """
@@ -1,12 +1,18 @@
 import tempfile
 import os
+import shutil
 from config import DEEPGRAM_API_KEY
 from deepgram import DeepgramClient, PrerecordedOptions
 from urllib.parse import quote_plus
 import aiohttp, json, asyncio
+import re
+import orjson
 
 dg_client = DeepgramClient(DEEPGRAM_API_KEY)
 
+# Filtro previo al parseo: interims, Metadata, SpeechStarted... se descartan
+_IS_FINAL_RE = re.compile(r'"is_final"\s*:\s*true')
+
 
 def build_deepgram_url(language="es", sample_rate=16000, keywords=None):
     base = (
@@ -54,7 +60,11 @@ async def connect_deepgram_stream(client_ws, api_key, on_final_callback, *, samp
             async def receive_transcripts():
                 async for msg in dg_ws:
                     if msg.type == aiohttp.WSMsgType.TEXT:
-                        data = json.loads(msg.data)
+                        # Deepgram manda resultados interim varias veces por segundo:
+                        # solo se parsean los finales (búsqueda de texto, sin JSON)
+                        if not _IS_FINAL_RE.search(msg.data):
+                            continue
+                        data = orjson.loads(msg.data)
                         if (
                             data.get("type") == "Results"
                             and "channel" in data
@@ -77,7 +87,8 @@ def speech_to_text(file, mimetype="audio/wav", language="es"):
         with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
             temp_file_path = tmp.name
             file.seek(0)
-            tmp.write(file.read())
+            # Copia por bloques de 1 MB: no materializa el audio completo en memoria
+            shutil.copyfileobj(file, tmp, length=1024 * 1024)
         
         print(f"📊 Procesando archivo de {os.path.getsize(temp_file_path)} bytes")
         
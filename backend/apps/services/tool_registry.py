@@ -1,9 +1,14 @@
 import re
 import inspect
 import asyncio
+import orjson
 from typing import Callable, Dict, Any, List, Optional
 from functools import wraps
 
+# Descripciones de parámetros en docstrings (":param nombre: ...")
+_PARAM_HINT_RE = re.compile(r"param|arg", re.IGNORECASE)
+_PARAM_NAME_RE = re.compile(r"(?:param|arg)\s+([a-zA-Z_0-9]+)", re.IGNORECASE)
+
 class ToolRegistry:
     def __init__(self):
         self.tools: Dict[str, Dict[str, Any]] = {}
@@ -51,11 +56,11 @@ class ToolRegistry:
             # Busca líneas como ":param nombre: descripción" o descriptores similares
             for line in doc.split('\n'):
                 line = line.strip()
-                if ':' in line and any(x in line.lower() for x in ['param', 'arg']):
+                if ':' in line and _PARAM_HINT_RE.search(line):
                     parts = line.split(':', 2)
                     if len(parts) >= 2:
                         # Extraer el nombre del parámetro (segunda parte después de param/arg)
-                        p_match = re.search(r'(?:param|arg)\s+([a-zA-Z_0-9]+)', parts[0], re.I)
+                        p_match = _PARAM_NAME_RE.search(parts[0])
                         if p_match:
                             p_name = p_match.group(1)
                             p_desc = parts[1].strip()
@@ -181,5 +186,13 @@ class ToolRegistry:
         
         return adk_wrapper
 
+def dump_result(data: Any, indent: bool = False) -> str:
+    """
+    Serializa el resultado de una herramienta para el LLM con orjson:
+    UTF-8 sin escapes \\uXXXX (menos tokens en textos con acentos).
+    """
+    return orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+
+
 TOOL_REGISTRY = ToolRegistry()
 tool = TOOL_REGISTRY.tool
@@ -1,4 +1,10 @@
 import inspect
+import re
+
+# Clasificación de errores: una sola búsqueda en C por patrón, sin recorrer
+# la lista de palabras clave en Python
+_CRITICAL_ERROR_RE = re.compile(r"authentication|permission|not_found|invalid_credentials", re.IGNORECASE)
+_MINOR_ERROR_RE = re.compile(r"timeout|rate_limit|temporary", re.IGNORECASE)
 
 def get_function_signature(func):
     """Obtiene la firma completa de una función"""
@@ -34,8 +40,7 @@ async def should_continue_after_error(user_input: str, failed_method: str, error
     """Determina si continuar después de un error"""
     
     # Errores críticos que siempre detienen la ejecución
-    critical_errors = ["authentication", "permission", "not_found", "invalid_credentials"]
-    if any(critical in error.lower() for critical in critical_errors):
+    if _CRITICAL_ERROR_RE.search(error):
         return False
     
     # Si es el último paso, no tiene sentido continuar
@@ -43,8 +48,7 @@ async def should_continue_after_error(user_input: str, failed_method: str, error
         return False
     
     # Para errores menores, intentar continuar
-    minor_errors = ["timeout", "rate_limit", "temporary"]
-    if any(minor in error.lower() for minor in minor_errors):
+    if _MINOR_ERROR_RE.search(error):
         print(f"⚠️ Error menor detectado, intentando continuar...")
         return True
     
@@ -3,11 +3,26 @@ import os
 import asyncio
 from dotenv import load_dotenv
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 load_dotenv()
-logging.basicConfig(level=logging.INFO)
+
+# Logging no bloqueante: los requests solo encolan el record; un hilo
+# aparte (QueueListener) es el que escribe en stdout.
+_log_queue = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_log_queue_handler = QueueHandler(_log_queue)
+_log_queue_handler.setFormatter(logging.Formatter("%(message)s"))  # El formato final lo pone el listener
+log_listener = QueueListener(_log_queue, _log_stream_handler, respect_handler_level=True)
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    handlers=[_log_queue_handler],
+)
+log_listener.start()
 logger = logging.getLogger("AssistWork_Agent")
 
 
@@ -29,6 +44,7 @@ async def lifespan(app: FastAPI):
     logger.info("✅ Servidor listo para recibir requests")
     yield
     logger.info("🛑 Servidor detenido")
+    log_listener.stop()  # Vacía la cola antes de salir
 
 FRONTEND_URL= os.getenv("FRONTEND_URL")
 BACKEND_URL= os.getenv("BACKEND_URL")
@@ -40,6 +56,10 @@ DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME")
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+
+# /metrics (estadísticas internas de cache): apagado por defecto
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = os.getenv("GROQ_MODEL")
@@ -53,6 +73,12 @@ GOOGLE_TOKEN_JSON= os.getenv("GOOGLE_TOKEN_JSON")
 
 
 DATABASE_URL= os.getenv("DATABASE_URL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+# JIT de Postgres desactivado por conexión (consultas OLTP cortas). Opt-in:
+# el pooler de Supabase en modo transacción (PgBouncer) rechaza "options".
+DB_DISABLE_JIT = os.getenv("DB_DISABLE_JIT", "false").lower() == "true"
 
 
 
@@ -62,6 +88,11 @@ JWT_SECRET_KEY= os.getenv("JWT_SECRET_KEY")
 JWT_ALGORITHM= os.getenv("JWT_ALGORITHM")
 JWT_ACCESS_TOKEN_EXPIRE_MINUTES= os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES")
 JWT_REFRESH_TOKEN_EXPIRE_DAYS= os.getenv("JWT_REFRESH_TOKEN_EXPIRE_DAYS")
+# Argon2id para contraseñas. Fijos por configuración (no por nº de CPUs de la
+# instancia): si cambian, cada login en otra instancia forzaría un re-hash.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB (64 MiB)
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
 
 COOKIE_SECURE= os.getenv("COOKIE_SECURE", "false").lower() == "true"
 
@@ -1,13 +1,12 @@
 import base64
 import re
 import html
-import json
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Dict, Any, List, Optional
 
 from apps.services.oauth.google_service_base.google_service_base import GoogleServiceBase
-from apps.services.tool_registry import tool
+from apps.services.tool_registry import tool, dump_result
 
 # --- CLASE DE SERVICIO ORIGINAL ---
 class GmailService(GoogleServiceBase):
@@ -77,13 +76,13 @@ async def send_email(user_id: str, to: str, subject: str, body: str, content_typ
         raw = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
         sent = service.users().messages().send(userId="me", body={'raw': raw}).execute()
         
-        return json.dumps({
+        return dump_result({
             "success": True,
             "id": sent["id"],
             "status_message": f"✅ Email enviado a {to}"
         })
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 @tool(group="gmail")
 async def list_emails(user_id: str, label: str = "INBOX", max_results: int = 5, query: str = None) -> str:
@@ -116,14 +115,14 @@ async def list_emails(user_id: str, label: str = "INBOX", max_results: int = 5,
                 "snippet": m.get('snippet', '')
             })
         
-        return json.dumps({
+        return dump_result({
             "success": True,
             "count": len(detailed),
             "instruction": "Para leer cada email usa read_email con el campo 'message_id' de cada item",
             "emails": detailed
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 @tool(group="gmail")
 async def read_email(user_id: str, message_id: str, preview_length: int = 500, show_full: bool = False) -> str:
@@ -134,14 +133,14 @@ async def read_email(user_id: str, message_id: str, preview_length: int = 500, s
         body = extract_message_body(msg.get('payload', {}))
         
         headers = msg.get('payload', {}).get('headers', [])
-        return json.dumps({
+        return dump_result({
             "success": True,
             "subject": next((h['value'] for h in headers if h['name'] == 'Subject'), ''),
             "from": next((h['value'] for h in headers if h['name'] == 'From'), ''),
             "body": body if show_full else f"{body[:preview_length]}..."
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 @tool(group="gmail")
 async def search_emails(user_id: str, query: str, max_results: int = 5) -> str:
@@ -152,4 +151,4 @@ async def search_emails(user_id: str, query: str, max_results: int = 5) -> str:
 async def test_gmail_connection(user_id: str) -> str:
     """Verifica la conexión con la API de Gmail."""
     result = gmail_instance.test_connection(user_id)
-    return json.dumps(result)
+    return dump_result(result)
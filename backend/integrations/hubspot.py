@@ -1,7 +1,6 @@
-import json
 from typing import Optional
 from apps.services.oauth.hubspot_service_base.hubspot_service_base import HubSpotServiceBase
-from apps.services.tool_registry import tool
+from apps.services.tool_registry import tool, dump_result
 
 # --- SERVICE ---
 class HubSpotService(HubSpotServiceBase):
@@ -64,9 +63,9 @@ async def list_hubspot_contacts(user_id: str, limit: int = 10) -> str:
             }
             for c in data.get("results", [])
         ]
-        return json.dumps({"success": True, "count": len(contacts), "contacts": contacts}, indent=2)
+        return dump_result({"success": True, "count": len(contacts), "contacts": contacts}, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="hubspot")
@@ -76,16 +75,16 @@ async def get_hubspot_contact(user_id: str, email: str) -> str:
         data = hubspot_instance.get_contact_by_email(user_id, email)
         results = data.get("results", [])
         if not results:
-            return json.dumps({"success": True, "found": False, "message": "No se encontró el contacto"})
+            return dump_result({"success": True, "found": False, "message": "No se encontró el contacto"})
         c = results[0]
-        return json.dumps({
+        return dump_result({
             "success": True,
             "found": True,
             "contact_id": c.get("id"),
             "properties": c.get("properties", {}),
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="hubspot")
@@ -96,13 +95,13 @@ async def create_hubspot_contact(user_id: str, email: str, firstname: str, lastn
         if phone: properties["phone"] = phone
         if company: properties["company"] = company
         data = hubspot_instance.create_contact(user_id, properties)
-        return json.dumps({
+        return dump_result({
             "success": True,
             "contact_id": data.get("id"),
             "status_message": f"✅ Contacto {firstname} {lastname} creado en HubSpot"
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="hubspot")
@@ -115,9 +114,9 @@ async def update_hubspot_contact(user_id: str, contact_id: str, firstname: Optio
         if phone: properties["phone"] = phone
         if company: properties["company"] = company
         hubspot_instance.update_contact(user_id, contact_id, properties)
-        return json.dumps({"success": True, "status_message": f"✅ Contacto {contact_id} actualizado"})
+        return dump_result({"success": True, "status_message": f"✅ Contacto {contact_id} actualizado"})
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="hubspot")
@@ -125,9 +124,9 @@ async def delete_hubspot_contact(user_id: str, contact_id: str) -> str:
     """Elimina un contacto de HubSpot por su ID."""
     try:
         hubspot_instance.delete_contact(user_id, contact_id)
-        return json.dumps({"success": True, "status_message": f"✅ Contacto {contact_id} eliminado"})
+        return dump_result({"success": True, "status_message": f"✅ Contacto {contact_id} eliminado"})
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 # ── TOOLS: DEALS ───────────────────────────────────────────
@@ -147,9 +146,9 @@ async def list_hubspot_deals(user_id: str, limit: int = 10) -> str:
             }
             for d in data.get("results", [])
         ]
-        return json.dumps({"success": True, "count": len(deals), "deals": deals}, indent=2)
+        return dump_result({"success": True, "count": len(deals), "deals": deals}, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="hubspot")
@@ -161,13 +160,13 @@ async def create_hubspot_deal(user_id: str, dealname: str, amount: Optional[str]
         if dealstage: properties["dealstage"] = dealstage
         if closedate: properties["closedate"] = closedate
         data = hubspot_instance.create_deal(user_id, properties)
-        return json.dumps({
+        return dump_result({
             "success": True,
             "deal_id": data.get("id"),
             "status_message": f"✅ Deal '{dealname}' creado en HubSpot"
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="hubspot")
@@ -180,13 +179,13 @@ async def update_hubspot_deal(user_id: str, deal_id: str, dealname: Optional[str
         if dealstage: properties["dealstage"] = dealstage
         if closedate: properties["closedate"] = closedate
         hubspot_instance.update_deal(user_id, deal_id, properties)
-        return json.dumps({"success": True, "status_message": f"✅ Deal {deal_id} actualizado"})
+        return dump_result({"success": True, "status_message": f"✅ Deal {deal_id} actualizado"})
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="hubspot")
 async def test_hubspot_connection(user_id: str) -> str:
     """Verifica la conexión con HubSpot CRM."""
     result = hubspot_instance.test_connection(user_id)
-    return json.dumps(result)
\ No newline at end of file
+    return dump_result(result)
\ No newline at end of file
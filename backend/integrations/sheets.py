@@ -1,7 +1,6 @@
-import json
 from typing import Optional, List
 from apps.services.oauth.google_service_base.google_service_base import GoogleServiceBase
-from apps.services.tool_registry import tool
+from apps.services.tool_registry import tool, dump_result
 
 class SheetsService(GoogleServiceBase):
     def __init__(self):
@@ -35,14 +34,14 @@ async def get_spreadsheet_info(user_id: str, spreadsheet_id: str) -> str:
             }
             for s in result.get("sheets", [])
         ]
-        return json.dumps({
+        return dump_result({
             "success": True,
             "spreadsheet_id": spreadsheet_id,
             "title": result["properties"]["title"],
             "sheets": sheets,
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="sheets")
@@ -54,14 +53,14 @@ async def get_sheet_values(user_id: str, spreadsheet_id: str, range: str) -> str
             spreadsheetId=spreadsheet_id, range=range
         ).execute()
         values = result.get("values", [])
-        return json.dumps({
+        return dump_result({
             "success": True,
             "range": result.get("range"),
             "total_rows": len(values),
             "values": values,
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="sheets")
@@ -78,9 +77,9 @@ async def get_all_sheets(user_id: str, spreadsheet_id: str) -> str:
             }
             for s in result.get("sheets", [])
         ]
-        return json.dumps({"success": True, "sheets": sheets}, indent=2)
+        return dump_result({"success": True, "sheets": sheets}, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 # ─────────────────────────────────────────
@@ -98,14 +97,14 @@ async def write_values(user_id: str, spreadsheet_id: str, range: str, values: Li
             valueInputOption="USER_ENTERED",
             body={"values": values},
         ).execute()
-        return json.dumps({
+        return dump_result({
             "success": True,
             "updated_range": result.get("updatedRange"),
             "updated_rows": result.get("updatedRows"),
             "updated_cells": result.get("updatedCells"),
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="sheets")
@@ -122,13 +121,13 @@ async def append_rows(user_id: str, spreadsheet_id: str, sheet_name: str, values
             body={"values": values},
         ).execute()
         updates = result.get("updates", {})
-        return json.dumps({
+        return dump_result({
             "success": True,
             "appended_range": updates.get("updatedRange"),
             "appended_rows": updates.get("updatedRows"),
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="sheets")
@@ -139,12 +138,12 @@ async def clear_range(user_id: str, spreadsheet_id: str, range: str) -> str:
         result = service.spreadsheets().values().clear(
             spreadsheetId=spreadsheet_id, range=range, body={}
         ).execute()
-        return json.dumps({
+        return dump_result({
             "success": True,
             "cleared_range": result.get("clearedRange"),
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="sheets")
@@ -174,14 +173,14 @@ async def create_spreadsheet(user_id: str, title: str, sheet_names: Optional[Lis
         result = service.spreadsheets().create(
             body={"properties": {"title": title}, "sheets": sheets}
         ).execute()
-        return json.dumps({
+        return dump_result({
             "success": True,
             "spreadsheet_id": result["spreadsheetId"],
             "title": result["properties"]["title"],
             "url": result["spreadsheetUrl"],
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="sheets")
@@ -194,13 +193,13 @@ async def add_sheet(user_id: str, spreadsheet_id: str, sheet_name: str) -> str:
             body={"requests": [{"addSheet": {"properties": {"title": sheet_name}}}]},
         ).execute()
         new_sheet = result["replies"][0]["addSheet"]["properties"]
-        return json.dumps({
+        return dump_result({
             "success": True,
             "sheet_id": new_sheet["sheetId"],
             "title": new_sheet["title"],
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="sheets")
@@ -212,9 +211,9 @@ async def delete_sheet(user_id: str, spreadsheet_id: str, sheet_id: int) -> str:
             spreadsheetId=spreadsheet_id,
             body={"requests": [{"deleteSheet": {"sheetId": sheet_id}}]},
         ).execute()
-        return json.dumps({"success": True, "deleted_sheet_id": sheet_id})
+        return dump_result({"success": True, "deleted_sheet_id": sheet_id})
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="sheets")
@@ -231,13 +230,13 @@ async def rename_sheet(user_id: str, spreadsheet_id: str, sheet_id: int, new_nam
                 }
             }]},
         ).execute()
-        return json.dumps({"success": True, "new_name": new_name})
+        return dump_result({"success": True, "new_name": new_name})
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 
 @tool(group="sheets")
 async def test_sheets_connection(user_id: str) -> str:
     """Verifica la conexión con la API de Google Sheets."""
     result = sheets_instance.test_connection(user_id)
-    return json.dumps(result)
\ No newline at end of file
+    return dump_result(result)
\ No newline at end of file
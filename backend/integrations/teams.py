@@ -1,7 +1,6 @@
-import json
 from typing import Optional
 from apps.services.oauth.microsoft_service_base.microsoft_service_base import MicrosoftServiceBase
-from apps.services.tool_registry import tool
+from apps.services.tool_registry import tool, dump_result
 
 # --- SERVICE ---
 
@@ -48,13 +47,13 @@ async def list_teams_chats(user_id: str) -> str:
             }
             for chat in data.get("value", [])
         ]
-        return json.dumps({
+        return dump_result({
             "success": True,
             "count": len(chats),
             "chats": chats
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 @tool(group="teams")
 async def list_teams_messages(user_id: str, chat_id: str) -> str:
@@ -70,29 +69,29 @@ async def list_teams_messages(user_id: str, chat_id: str) -> str:
             }
             for msg in data.get("value", [])
         ]
-        return json.dumps({
+        return dump_result({
             "success": True,
             "count": len(messages),
             "messages": messages
-        }, indent=2)
+        }, indent=True)
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 @tool(group="teams")
 async def send_teams_message(user_id: str, chat_id: str, content: str) -> str:
     """Envía un mensaje a un chat de Teams"""
     try:
         data = teams_instance.send_message(user_id, chat_id, content)
-        return json.dumps({
+        return dump_result({
             "success": True,
             "message_id": data.get("id"),
             "status_message": "✅ Mensaje enviado en Teams"
         })
     except Exception as e:
-        return json.dumps({"success": False, "error": str(e)})
+        return dump_result({"success": False, "error": str(e)})
 
 @tool(group="teams")
 async def test_teams_connection(user_id: str) -> str:
     """Verifica conexión con Microsoft Teams"""
     result = teams_instance.test_connection(user_id)
-    return json.dumps(result)
+    return dump_result(result)
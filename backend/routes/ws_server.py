@@ -1,42 +1,68 @@
-import json 
+import asyncio
+import logging
+import orjson
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from config import DEEPGRAM_API_KEY
 
 # Servicios
 from apps.services.text_speach.stt_service import connect_deepgram_stream
 from apps.services.text_speach.tts_service import text_to_speech
-from apps.services.memory.qdrant_service import store_message, search_context
+from apps.services.memory.qdrant_service import store_messages, search_context
 from apps.services.orchestrator.orchestrator_service import orchestrator
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Tareas en background (fire-and-forget): el loop solo guarda referencias
+# débiles, así que se retienen aquí hasta que terminan
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _spawn_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _store_turn(transcript: str, response: str):
+    """Indexa el turno en Qdrant fuera del camino de la respuesta."""
+    try:
+        await asyncio.to_thread(
+            store_messages,
+            [transcript, response],
+            [{"role": "user"}, {"role": "assistant"}],
+        )
+    except Exception as e:
+        logger.warning("⚠️ Error indexando mensajes en Qdrant (background): %s", e)
+
 
 @router.websocket("/ws/transcribe")
 async def websocket_transcribe(websocket: WebSocket):
     await websocket.accept()
-    print("🔌 Cliente conectado")
+    logger.info("🔌 Cliente conectado")
 
     async def process_final_transcript(transcript: str):
-        print(f"📝 Final recibido: {transcript}")
+        logger.info("📝 Final recibido: %s", transcript)
         try:
-            # 1. Buscar contexto en memoria
-            context_list = search_context(transcript)
+            # 1. Buscar contexto en memoria (bloqueante → hilo)
+            context_list = await asyncio.to_thread(search_context, transcript)
             context_text = "\n".join(context_list)
 
             # 2. Pasar al orquestador
             result = await orchestrator(transcript, context=context_text)
 
-            # 3. Guardar en memoria
-            store_message(transcript, metadata={"role": "user"})
-            store_message(str(result), metadata={"role": "assistant"})
+            # 3. Guardar en memoria en segundo plano (no bloquea la respuesta)
+            _spawn_background(_store_turn(transcript, str(result)))
 
             # 4. Generar voz con TTS
             audio_path = await text_to_speech(str(result), lang="es")
 
             # 5. Enviar JSON con transcripción y respuesta
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(orjson.dumps({
                 "transcript": transcript,
                 "response": str(result)
-            }))
+            }).decode())
 
             # 6. Mandar audio generado (bytes)
             with open(audio_path, "rb") as f:
@@ -44,15 +70,15 @@ async def websocket_transcribe(websocket: WebSocket):
                 await websocket.send_bytes(audio_bytes)
 
         except RuntimeError:
-            print("⚠️ Cliente desconectado antes de enviar la transcripción")
+            logger.info("⚠️ Cliente desconectado antes de enviar la transcripción")
 
     try:
         await connect_deepgram_stream(websocket, DEEPGRAM_API_KEY, process_final_transcript)
     except WebSocketDisconnect:
-        print("⚠️ Cliente desconectado")
+        logger.info("⚠️ Cliente desconectado")
     except Exception as e:
-        print(f"❌ Error en conexión con Deepgram: {e}")
+        logger.error("❌ Error en conexión con Deepgram: %s", e)
         try:
-            await websocket.send_text(json.dumps({"error": str(e)}))
+            await websocket.send_text(orjson.dumps({"error": str(e)}).decode())
         except:
             pass